@@ -1,7 +1,10 @@
 """GitHub OAuth authentication with HTTP-only cookie support."""
 import os
+import time
+import hashlib
+import threading
 import jwt
-from datetime import datetime, timedelta
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import RedirectResponse, JSONResponse
@@ -21,6 +24,13 @@ if not JWT_SECRET:
 
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_DAYS = 7
+JWT_ISSUER = "space-biology-engine"
+JWT_AUDIENCE = "space-biology-frontend"
+
+# Built once at import instead of per token
+_JWT_KEY = JWT_SECRET.encode()
+_JWT_ALGORITHMS = [JWT_ALGORITHM]
+_JWT_STATIC_CLAIMS = {"iss": JWT_ISSUER, "aud": JWT_AUDIENCE}
 COOKIE_NAME = "auth_token"
 COOKIE_SECURE = os.getenv("NODE_ENV") == "production"  # Secure in production only
 COOKIE_SAMESITE = "lax"
@@ -28,6 +38,12 @@ COOKIE_MAX_AGE = 60 * 60 * 24 * JWT_EXPIRATION_DAYS  # 7 days in seconds
 
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 
+# Decoded payloads of recently verified tokens, keyed by SHA-256(token).
+# Kept short-lived so a revoked token is only honoured for a few seconds.
+JWT_CACHE_TTL_SECONDS = 5
+_jwt_cache = TTLCache(maxsize=10000, ttl=JWT_CACHE_TTL_SECONDS)
+_jwt_cache_lock = threading.Lock()
+
 
 class OAuthCallbackData(BaseModel):
     """Data from GitHub OAuth callback."""
@@ -41,28 +57,38 @@ class OAuthCallbackData(BaseModel):
 
 def create_jwt_token(user_id: str) -> str:
     """Create JWT token for user."""
-    expiration = datetime.utcnow() + timedelta(days=JWT_EXPIRATION_DAYS)
+    # Epoch seconds (UTC) - PyJWT takes these as-is, no datetime conversion
+    now = int(time.time())
     payload = {
         "user_id": str(user_id),
-        "exp": expiration,
-        "iat": datetime.utcnow(),
-        "iss": "space-biology-engine",
-        "aud": "space-biology-frontend"
+        "exp": now + JWT_EXPIRATION_DAYS * 24 * 60 * 60,
+        "iat": now,
+        **_JWT_STATIC_CLAIMS
     }
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    return jwt.encode(payload, _JWT_KEY, algorithm=JWT_ALGORITHM)
 
 
 def verify_jwt_token(token: str) -> dict:
-    """Verify JWT token."""
+    """Verify JWT token, reusing the decoded payload for recently seen tokens."""
+    key = hashlib.sha256(token.encode()).digest()
+    with _jwt_cache_lock:
+        payload = _jwt_cache.get(key)
+    if payload is not None:
+        exp = payload.get("exp")
+        if exp is not None and exp > time.time():
+            return payload
+        with _jwt_cache_lock:
+            _jwt_cache.pop(key, None)
+        raise HTTPException(status_code=401, detail="Token has expired")
+
     try:
         payload = jwt.decode(
             token, 
-            JWT_SECRET, 
-            algorithms=[JWT_ALGORITHM],
-            issuer="space-biology-engine",
-            audience="space-biology-frontend"
+            _JWT_KEY, 
+            algorithms=_JWT_ALGORITHMS,
+            issuer=JWT_ISSUER,
+            audience=JWT_AUDIENCE
         )
-        return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
     except jwt.InvalidIssuerError:
@@ -72,32 +98,61 @@ def verify_jwt_token(token: str) -> dict:
     except jwt.InvalidTokenError as e:
         raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
 
+    # Only tokens that expire can be served from the cache (the hit path
+    # re-checks exp instead of decoding again)
+    if isinstance(payload.get("exp"), (int, float)):
+        with _jwt_cache_lock:
+            _jwt_cache[key] = payload
+    return payload
 
-def get_current_user_from_request(request: Request) -> dict:
-    """Get current user from either HTTP-only cookie or Authorization header."""
-    token = None
-    
-    # Try to get from cookie first
-    token = request.cookies.get(COOKIE_NAME)
-
-    
-    # If no cookie, try Authorization header (for proxy)
-    if not token:
-        auth_header = request.headers.get("Authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            token = auth_header.split(" ")[1]
-    
+
+def _token_from_headers(headers) -> str | None:
+    """Pull the auth token out of raw ASGI headers (cookie first, then Bearer)."""
+    cookie_prefix = COOKIE_NAME.encode() + b"="
+    bearer_token = None
+    for name, value in headers:
+        if name == b"cookie":
+            for part in value.split(b";"):
+                part = part.strip()
+                if part.startswith(cookie_prefix):
+                    token = part[len(cookie_prefix):].strip(b'"')
+                    if token:
+                        return token.decode("latin-1")
+        elif name == b"authorization" and value.startswith(b"Bearer "):
+            bearer_token = value[7:].strip().decode("latin-1") or None
+    return bearer_token
+
+
+def _resolve_auth(token: str | None) -> dict:
+    """Verify token and return the request auth state (user_id, payload, error)."""
     if not token:
+        return {"user_id": None, "auth_payload": None, "auth_error": "Not authenticated"}
+    try:
+        payload = verify_jwt_token(token)
+    except HTTPException as e:
+        return {"user_id": None, "auth_payload": None, "auth_error": e.detail}
 
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    payload = verify_jwt_token(token)
     user_id = payload.get("user_id")
-    
     if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid token payload")
-    
-    return {"user_id": user_id, "payload": payload}
+        return {"user_id": None, "auth_payload": None, "auth_error": "Invalid token payload"}
+    return {"user_id": user_id, "auth_payload": payload, "auth_error": None}
+
+
+def get_current_user_from_request(request: Request) -> dict:
+    """Get current user from the auth cookie or Authorization header.
+
+    The token is only verified when a route asks for the user, so public routes
+    never pay for JWT decoding; the result is kept in ``scope["state"]`` so later
+    calls in the same request reuse it.
+    """
+    state = request.scope.setdefault("state", {})
+    if "user_id" not in state:
+        state.update(_resolve_auth(_token_from_headers(request.scope["headers"])))
+
+    if not state["user_id"]:
+        raise HTTPException(status_code=401, detail=state["auth_error"])
+
+    return {"user_id": state["user_id"], "payload": state["auth_payload"]}
 
 
 @router.post("/oauth/callback")
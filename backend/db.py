@@ -23,13 +23,20 @@ if USE_MEMORY_DB:
             self.name = name
             self.data = _users if name == "users" else {}
         
-        async def find_one(self, query):
+        @staticmethod
+        def _project(doc, projection):
+            # Only exclusion projections ({"field": 0}) are used by this module
+            if doc is None or not projection:
+                return doc
+            return {k: v for k, v in doc.items() if k not in projection}
+        
+        async def find_one(self, query, projection=None):
             if "_id" in query:
-                return self.data.get(query["_id"])
+                return self._project(self.data.get(query["_id"]), projection)
             elif "github_id" in query:
                 for user in self.data.values():
                     if user.get("github_id") == query["github_id"]:
-                        return user
+                        return self._project(user, projection)
             return None
         
         async def update_one(self, query, update):
@@ -42,6 +49,20 @@ if USE_MEMORY_DB:
             user_id = data.get("_id")
             self.data[user_id] = data
             return True
+        
+        async def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=None):
+            # Always behaves like ReturnDocument.AFTER
+            user = await self.find_one(query)
+            if user is None:
+                if not upsert:
+                    return None
+                user = {**query, **update.get("$setOnInsert", {})}
+                self.data[user["_id"]] = user
+            user.update(update.get("$set", {}))
+            return self._project(user, projection)
+        
+        async def create_index(self, keys, **kwargs):
+            return keys
     
     class MockClient:
         def __init__(self):
@@ -120,22 +141,36 @@ class UserResponse(BaseModel):
     is_active: bool
 
 
+# Leave the encrypted GitHub token out of routine user reads
+USER_PROJECTION = {"access_token": 0}
+
+
+async def ensure_indexes():
+    """Create the indexes user lookups rely on (idempotent)."""
+    await users_collection.create_index("github_id", unique=True)
+
+
 async def get_user_by_github_id(github_id: str) -> Optional[dict]:
-    """Get user by GitHub ID."""
-    return await users_collection.find_one({"github_id": github_id})
+    """Get user by GitHub ID (without access token)."""
+    return await users_collection.find_one({"github_id": github_id}, USER_PROJECTION)
 
 
 async def get_user_by_id(user_id: str) -> Optional[dict]:
-    """Get user by ID."""
+    """Get user by ID (without access token)."""
+    return await users_collection.find_one({"_id": user_id}, USER_PROJECTION)
+
+
+async def get_user_by_id_with_token(user_id: str) -> Optional[dict]:
+    """Get user by ID including the encrypted access token."""
     return await users_collection.find_one({"_id": user_id})
 
 
 async def create_or_update_user(github_data: dict, access_token: str) -> dict:
-    """Create or update user from GitHub data."""
+    """Create or update user from GitHub data (single upsert round trip)."""
     from bson import ObjectId
+    from pymongo import ReturnDocument
     
     github_id = str(github_data["id"])
-    existing_user = await get_user_by_github_id(github_id)
     
     now = datetime.utcnow()
     
@@ -151,26 +186,21 @@ async def create_or_update_user(github_data: dict, access_token: str) -> dict:
         "is_active": True
     }
     
-    if existing_user:
-        # Update existing user
-        await users_collection.update_one(
-            {"_id": existing_user["_id"]},
-            {"$set": user_data}
-        )
-        user = await get_user_by_id(existing_user["_id"])
-    else:
-        # Create new user
-        user_data["_id"] = str(ObjectId())
-        user_data["created_at"] = now
-        await users_collection.insert_one(user_data)
-        user = user_data
+    # Update existing user, or create it with a fresh id on first login
+    user = await users_collection.find_one_and_update(
+        {"github_id": github_id},
+        {"$set": user_data, "$setOnInsert": {"_id": str(ObjectId()), "created_at": now}},
+        projection=USER_PROJECTION,
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
     
     return user
 
 
 async def get_user_access_token(user_id: str) -> Optional[str]:
     """Get decrypted GitHub access token for user."""
-    user = await get_user_by_id(user_id)
+    user = await get_user_by_id_with_token(user_id)
     if not user:
         return None
     encrypted_token = user.get("access_token")
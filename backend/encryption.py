@@ -1,10 +1,13 @@
 """Encryption utilities for sensitive data."""
 import os
 import base64
+import hashlib
 import secrets
+from functools import lru_cache
 from dotenv import load_dotenv
 from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 # Load environment variables
@@ -18,9 +21,27 @@ if not ENCRYPTION_KEY:
 # Use a random salt stored in env or generate one per encryption
 ENCRYPTION_SALT = os.getenv("ENCRYPTION_SALT")
 
+# Prefix of values whose key comes from HKDF. Values without it were written
+# by older releases with a PBKDF2-derived key; they still decrypt and get
+# re-encrypted in the current format the next time they are written (login).
+VERSION_PREFIX = "v1:"
 
+
+@lru_cache(maxsize=4096)
 def derive_key(key: str, salt: bytes) -> bytes:
-    """Derive a Fernet key from password and salt."""
+    """Derive a Fernet key from the (high-entropy) server secret and salt."""
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        info=b"fernet-v1",
+    )
+    return base64.urlsafe_b64encode(hkdf.derive(key.encode()))
+
+
+@lru_cache(maxsize=4096)
+def derive_legacy_key(key: str, salt: bytes) -> bytes:
+    """Derive a Fernet key the way unversioned values were encrypted."""
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,
@@ -30,27 +51,39 @@ def derive_key(key: str, salt: bytes) -> bytes:
     return base64.urlsafe_b64encode(kdf.derive(key.encode()))
 
 
+# With a fixed salt the key is derived once per process instead of per encryption
+if ENCRYPTION_SALT:
+    _FIXED_SALT = hashlib.sha256(ENCRYPTION_SALT.encode()).digest()[:16]
+    _fixed_fernet = Fernet(derive_key(ENCRYPTION_KEY, _FIXED_SALT))
+else:
+    _FIXED_SALT = None
+    _fixed_fernet = None
+
+
 def encrypt_value(value: str) -> str:
-    """Encrypt a string value with random salt.
+    """Encrypt a string value with a random salt (or the ENCRYPTION_SALT one).
     
-    Format: base64(salt + encrypted_data)
+    Format: v1:base64(salt + encrypted_data)
     """
     if not value:
         return value
     
-    # Generate random salt for each encryption
-    salt = secrets.token_bytes(16)
-    
-    # Derive key with this salt
-    key = derive_key(ENCRYPTION_KEY, salt)
-    f = Fernet(key)
+    if _fixed_fernet:
+        salt, f = _FIXED_SALT, _fixed_fernet
+    else:
+        # Generate random salt for each encryption
+        salt = secrets.token_bytes(16)
+        
+        # Derive key with this salt
+        key = derive_key(ENCRYPTION_KEY, salt)
+        f = Fernet(key)
     
     # Encrypt
     encrypted = f.encrypt(value.encode())
     
     # Combine salt + encrypted and encode
     combined = salt + encrypted
-    return base64.urlsafe_b64encode(combined).decode()
+    return VERSION_PREFIX + base64.urlsafe_b64encode(combined).decode()
 
 
 def decrypt_value(encrypted_value: str) -> str:
@@ -62,6 +95,10 @@ def decrypt_value(encrypted_value: str) -> str:
         return encrypted_value
     
     try:
+        legacy = not encrypted_value.startswith(VERSION_PREFIX)
+        if not legacy:
+            encrypted_value = encrypted_value[len(VERSION_PREFIX):]
+        
         # Decode from base64
         combined = base64.urlsafe_b64decode(encrypted_value.encode())
         
@@ -69,8 +106,11 @@ def decrypt_value(encrypted_value: str) -> str:
         salt = combined[:16]
         encrypted = combined[16:]
         
-        # Derive key with the salt
-        key = derive_key(ENCRYPTION_KEY, salt)
+        # Derive key with the salt (cached per salt)
+        if legacy:
+            key = derive_legacy_key(ENCRYPTION_KEY, salt)
+        else:
+            key = derive_key(ENCRYPTION_KEY, salt)
         f = Fernet(key)
         
         # Decrypt
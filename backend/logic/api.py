@@ -1,18 +1,26 @@
 from fastapi import FastAPI, Query, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import os
+import re
+import asyncio
+import orjson
+import numpy as np
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from pinecone import Pinecone
-from google import genai
-from logic.utils import embed_texts, gemini_client
+from logic.utils import embed_query, gemini_client
+from logic.cache import cached_response, SemanticCache
 from logic.auth import authenticate_user, create_user, verify_token, logout_user, get_user_by_id
 from collections import Counter
 
 
 load_dotenv()
 
+PINECONE_POOL_SIZE = 32
+
 # Initialize Pinecone with error handling
 try:
     pinecone_api_key = os.getenv("PINECONE_API_KEY")
@@ -21,19 +29,149 @@ try:
         pc = None
         index = None
     else:
-        pc = Pinecone(api_key=pinecone_api_key)
+        # One pooled, keep-alive connection set shared by all concurrent queries
+        pc = Pinecone(api_key=pinecone_api_key, connection_pool_maxsize=PINECONE_POOL_SIZE)
         INDEX_NAME = "space-biology"
-        index = pc.Index(INDEX_NAME)
+        index = pc.Index(INDEX_NAME, pool_threads=PINECONE_POOL_SIZE)
 except Exception as e:
     print(f"⚠️  Warning: Pinecone initialization failed: {str(e)}")
     pc = None
     index = None
 
-# Initialize Gemini client
-try:
-    gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-except:
-    gemini_client = None
+# Recent /search, /qa and /neo4j/search responses, matched by query text and,
+# for the endpoints in SEMANTIC_MATCH_ENDPOINTS, by query embedding. Sibling
+# questions ("... on bone" vs "... on muscle") can clear the similarity
+# threshold, so /qa only reuses answers to the same question by default.
+semantic_cache = SemanticCache()
+SEMANTIC_MATCH_ENDPOINTS = frozenset(
+    name.strip() for name in os.getenv("SEMANTIC_MATCH_ENDPOINTS", "search,neo4j_search").split(",")
+)
+
+def get_similar_cached(endpoint, scope, embedding):
+    """Semantic-cache hit for embedding, if endpoint opted into similarity matching"""
+    if endpoint not in SEMANTIC_MATCH_ENDPOINTS:
+        return None
+    return semantic_cache.get_similar(scope, embedding)
+
+# Pinecone queries currently awaiting a response, keyed by their parameters
+_inflight_queries = {}
+
+async def query_index(**query):
+    """Run index.query off the event loop, sharing one call among identical
+    concurrent requests (e.g. a burst of the same search) instead of issuing
+    one round trip each."""
+    key = orjson.dumps(query, option=orjson.OPT_SORT_KEYS)
+    task = _inflight_queries.get(key)
+    if task is None:
+        task = asyncio.ensure_future(asyncio.to_thread(index.query, **query))
+        _inflight_queries[key] = task
+        task.add_done_callback(lambda _: _inflight_queries.pop(key, None))
+    # Shield so one disconnected client doesn't cancel the call for the rest
+    return await asyncio.shield(task)
+
+# Constant probe vector for the metadata-only sample scans (stats, entities,
+# topics, trends) - built once instead of allocating 1024 floats per request
+PROBE_VECTOR = [0.1] * 1024
+
+# Probe-query matches and index stats only change on ingest, so the
+# aggregate endpoints share them instead of each paying a Pinecone round trip
+SAMPLE_CACHE_TTL = 300  # seconds
+INDEX_STATS_CACHE_TTL = 60  # seconds
+_sample_cache = TTLCache(maxsize=16, ttl=SAMPLE_CACHE_TTL)
+_index_stats_cache = TTLCache(maxsize=1, ttl=INDEX_STATS_CACHE_TTL)
+# Locks only coalesce concurrent misses: one per sample key while it is being
+# fetched, and a separate one for the index stats
+_sample_locks = {}  # (top_k, source) -> asyncio.Lock
+_index_stats_lock = asyncio.Lock()
+
+async def get_sample_matches(top_k, source="nasa_publications"):
+    """Metadata of a top_k-sized sample of publications from source (cached)."""
+    key = (top_k, source)
+    matches = _sample_cache.get(key)
+    if matches is not None:
+        return matches
+    lock = _sample_locks.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            matches = _sample_cache.get(key)
+            if matches is None:
+                res = await query_index(
+                    vector=PROBE_VECTOR,
+                    top_k=top_k,
+                    include_metadata=True,
+                    include_values=False,
+                    filter={"source": {"$eq": source}}
+                )
+                matches = _sample_cache[key] = res['matches']
+            return matches
+    finally:
+        if _sample_locks.get(key) is lock:
+            del _sample_locks[key]
+
+async def get_index_stats():
+    """index.describe_index_stats(), cached for INDEX_STATS_CACHE_TTL seconds."""
+    stats = _index_stats_cache.get("stats")
+    if stats is not None:
+        return stats
+    async with _index_stats_lock:
+        stats = _index_stats_cache.get("stats")
+        if stats is None:
+            stats = _index_stats_cache["stats"] = await asyncio.to_thread(index.describe_index_stats)
+        return stats
+
+# Research topics and their keywords for /knowledge-graph/topics
+KG_TOPICS = {
+    "microgravity": ["microgravity", "weightlessness", "gravity"],
+    "radiation": ["radiation", "cosmic", "particle"],
+    "bone": ["bone", "skeletal", "osteo"],
+    "muscle": ["muscle", "muscular", "atrophy"],
+    "cardiovascular": ["cardiovascular", "heart", "blood"],
+    "plant": ["plant", "botany", "growth"],
+    "cell": ["cell", "cellular", "molecular"],
+    "astronaut": ["astronaut", "crew", "human"],
+    "space": ["space", "spaceflight", "orbital"],
+    "biology": ["biology", "biological", "biomedical"]
+}
+
+# One alternation per topic so each title is scanned in C rather than with
+# a Python-level `any(keyword in title ...)` loop (same substring semantics)
+KG_TOPIC_PATTERNS = {
+    topic: re.compile("|".join(map(re.escape, keywords)))
+    for topic, keywords in KG_TOPICS.items()
+}
+
+# Research topics used to link publications in /neo4j/graph-data
+GRAPH_RESEARCH_TOPICS = {
+    "microgravity": ["microgravity", "weightlessness", "gravity", "spaceflight"],
+    "radiation": ["radiation", "cosmic", "particle", "irradiation"],
+    "bone": ["bone", "skeletal", "osteo", "calcium"],
+    "muscle": ["muscle", "muscular", "atrophy", "myofiber"],
+    "cell": ["cell", "cellular", "molecular", "mitochondria"],
+    "plant": ["plant", "botany", "growth", "arabidopsis"],
+    "protein": ["protein", "enzyme", "metabolism", "synthesis"],
+    "dna": ["dna", "genetic", "genome", "chromosome"]
+}
+GRAPH_TOPIC_PATTERNS = {
+    topic: re.compile("|".join(map(re.escape, keywords)))
+    for topic, keywords in GRAPH_RESEARCH_TOPICS.items()
+}
+
+# Words ignored when extracting entities / common terms from titles
+STOPWORDS = frozenset({"and", "the", "for", "with", "from", "effects", "study"})
+TRENDS_STOPWORDS = frozenset({"and", "the", "for", "with", "from"})
+# Words ignored when linking /neo4j/graph-data publications by shared title words
+GRAPH_STOP_WORDS = frozenset({
+    "the", "and", "of", "in", "on", "at", "to", "for", "with", "by", "from", "as", "is", "are",
+    "was", "were", "be", "been", "being", "have", "has", "had", "do", "does", "did", "will",
+    "would", "could", "should", "may", "might", "can", "must", "shall", "a", "an", "study",
+    "effect", "analysis", "research", "investigation"
+})
+
+# Punctuation stripped from the ends of whitespace-split title words, so tokens
+# like "SARS-CoV-2" or "CDKN1a/p21" stay whole
+TITLE_PUNCTUATION = ".,()[]"
+# Whole whitespace-delimited, letters-only words longer than 3 chars
+ALPHA_WORD_RE = re.compile(r"(?<!\S)[^\W\d_]{4,}(?!\S)")
 
 # Pydantic models for authentication
 class UserSignup(BaseModel):
@@ -51,7 +189,29 @@ class TokenResponse(BaseModel):
     token: Optional[str] = None
     user: Optional[dict] = None
 
-app = FastAPI(title="Space Biology Knowledge Engine (Gemini + Pinecone)")
+# Pydantic models for search responses
+class SearchHit(BaseModel):
+    id: str
+    title: str
+    link: str = ""
+    abstract: str = ""
+    source: str
+    score: float
+    row_id: int | float | str = ""
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (several times faster than stdlib json).
+    
+    Defined here rather than using fastapi.responses.ORJSONResponse, which is
+    deprecated in recent FastAPI releases.
+    """
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+app = FastAPI(
+    title="Space Biology Knowledge Engine (Gemini + Pinecone)",
+    default_response_class=ORJSONResponse
+)
 
 # Add CORS middleware
 app.add_middleware(
@@ -62,23 +222,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.get("/search")
-def search(q: str = Query(...), top_k: int = 5, source: str | None = None):
+@app.get("/search", response_model=List[SearchHit])
+async def search(q: str = Query(...), top_k: int = 5, source: str | None = None):
     """Search across 600+ NASA publications using real embeddings"""
     if not index:
         raise HTTPException(status_code=503, detail="Search service unavailable. Pinecone not configured.")
     
+    scope = f"search:{top_k}:{source or 'nasa_publications'}"
+    cached = semantic_cache.get(scope, q)
+    if cached is not None:
+        return cached
+    
     try:
         # Use REAL embeddings from Gemini
-        emb = embed_texts([q])[0]
+        emb = list(await asyncio.to_thread(embed_query, q))
+        cached = get_similar_cached("search", scope, emb)
+        if cached is not None:
+            return cached
+        
         query = {"vector": emb, "top_k": top_k, "include_metadata": True}
         if source:
             query["filter"] = {"source": {"$eq": source}}
         else:
             query["filter"] = {"source": {"$eq": "nasa_publications"}}
         
-        res = index.query(**query)
-        return [
+        res = await query_index(**query)
+        results = [
             {
                 "id": m["id"],
                 "title": m["metadata"]["title"],
@@ -90,93 +259,113 @@ def search(q: str = Query(...), top_k: int = 5, source: str | None = None):
             }
             for m in res["matches"]
         ]
+        semantic_cache.put(scope, q, emb, results)
+        return results
     except Exception as e:
         import traceback
         print(f"Search error: {e}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+def generate_detailed_fallback_answer(question, matches):
+    """Generate a detailed answer using publication metadata when Gemini is unavailable"""
+    if not matches:
+        return f"No publications found for '{question}'."
+    
+    answer_parts = []
+    answer_parts.append(f"Based on **{len(matches)} relevant NASA space biology publications**, here's what we found about '{question}':")
+    answer_parts.append("")
+    
+    # Analyze top 3 publications for detailed insights
+    for i, match in enumerate(matches[:3], 1):
+        metadata = match['metadata']
+        title = metadata.get('title', 'Unknown Title')
+        abstract = metadata.get('abstract', '')
+        source = metadata.get('source', 'NASA')
+        
+        # Extract key insights from abstract
+        if abstract and len(abstract) > 50:
+            # Take first 250 characters of abstract for summary
+            summary = abstract[:250] + "..." if len(abstract) > 250 else abstract
+            answer_parts.append(f"**{i}. {title}** _{source}_")
+            answer_parts.append(f"   • **Key finding:** {summary}")
+            answer_parts.append("")
+        else:
+            answer_parts.append(f"**{i}. {title}** _{source}_")
+            answer_parts.append(f"   • Available for detailed review in the search results below")
+            answer_parts.append("")
+    
+    if len(matches) > 3:
+        answer_parts.append(f"**Additionally, {len(matches) - 3} more relevant publications** are available in the search results below for further exploration.")
+        answer_parts.append("")
+    
+    answer_parts.append(f"💡 **Note:** Detailed AI analysis is temporarily unavailable. The publications listed above contain comprehensive information about *{question.lower()}*.")
+    
+    return "\n".join(answer_parts)
+
 @app.get("/qa")
-def qa(q: str = Query(...), top_k: int = 5, source: str | None = None):
+async def qa(q: str = Query(...), top_k: int = 5, source: str | None = None):
     """Q&A across 600+ NASA publications using real embeddings"""
     if not index:
         raise HTTPException(status_code=503, detail="Q&A service unavailable. Pinecone not configured.")
     
+    scope = f"qa:{top_k}:{source or 'nasa_publications'}"
+    cached = semantic_cache.get(scope, q)
+    if cached is not None:
+        return cached
+    
     try:
         # Use REAL embeddings from Gemini
-        emb = embed_texts([q])[0]
+        emb = list(await asyncio.to_thread(embed_query, q))
+        cached = get_similar_cached("qa", scope, emb)
+        if cached is not None:
+            return cached
+        
         query = {"vector": emb, "top_k": top_k, "include_metadata": True}
         if source:
             query["filter"] = {"source": {"$eq": source}}
         else:
             query["filter"] = {"source": {"$eq": "nasa_publications"}}
-        res = index.query(**query)
+        res = await query_index(**query)
     except Exception as e:
         import traceback
         print(f"Error in QA endpoint: {str(e)}")
         print(f"Full traceback:\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
     
-    context = "\n\n".join([
-        f"Title: {m['metadata']['title']}\nAbstract: {m['metadata'].get('abstract', 'No abstract available')}\nLink: {m['metadata'].get('link', 'N/A')}" 
-        for m in res["matches"]
-    ])
-    
-    def generate_detailed_fallback_answer(question, matches):
-        """Generate a detailed answer using publication metadata when Gemini is unavailable"""
-        if not matches:
-            return f"No publications found for '{question}'."
-        
-        answer_parts = []
-        answer_parts.append(f"Based on **{len(matches)} relevant NASA space biology publications**, here's what we found about '{question}':")
-        answer_parts.append("")
-        
-        # Analyze top 3 publications for detailed insights
-        for i, match in enumerate(matches[:3], 1):
-            metadata = match['metadata']
-            title = metadata.get('title', 'Unknown Title')
-            abstract = metadata.get('abstract', '')
-            source = metadata.get('source', 'NASA')
-            
-            # Extract key insights from abstract
-            if abstract and len(abstract) > 50:
-                # Take first 250 characters of abstract for summary
-                summary = abstract[:250] + "..." if len(abstract) > 250 else abstract
-                answer_parts.append(f"**{i}. {title}** _{source}_")
-                answer_parts.append(f"   • **Key finding:** {summary}")
-                answer_parts.append("")
-            else:
-                answer_parts.append(f"**{i}. {title}** _{source}_")
-                answer_parts.append(f"   • Available for detailed review in the search results below")
-                answer_parts.append("")
-        
-        if len(matches) > 3:
-            answer_parts.append(f"**Additionally, {len(matches) - 3} more relevant publications** are available in the search results below for further exploration.")
-            answer_parts.append("")
-        
-        answer_parts.append(f"💡 **Note:** Detailed AI analysis is temporarily unavailable. The publications listed above contain comprehensive information about *{question.lower()}*.")
-        
-        return "\n".join(answer_parts)
+    metadatas = [m["metadata"] for m in res["matches"]]
+    context = "\n\n".join(
+        f"Title: {md['title']}\nAbstract: {md.get('abstract', 'No abstract available')}\nLink: {md.get('link', 'N/A')}"
+        for md in metadatas
+    )
     
     try:
-        if gemini_client:
+        # Nothing to ground an answer on - skip the Gemini round trip
+        if gemini_client and metadatas:
             prompt = f"Use the following NASA space biology publications to answer:\n\n{context}\n\nQuestion: {q}\nProvide a comprehensive answer in 4-5 sentences, citing specific publication titles and key findings."
-            resp = gemini_client.models.generate_content(
+            resp = await gemini_client.aio.models.generate_content(
                 model="gemini-2.5-flash-lite", contents=prompt
             )
             answer = resp.text
+            answered_by_gemini = True
         else:
             answer = generate_detailed_fallback_answer(q, res["matches"])
+            answered_by_gemini = False
     except Exception as e:
         # Use detailed fallback response
         answer = generate_detailed_fallback_answer(q, res["matches"])
+        answered_by_gemini = False
     
-    return {
+    response = {
         "answer": answer,
-        "sources": [m["metadata"]["title"] for m in res["matches"]],
-        "links": [m["metadata"].get("link", "") for m in res["matches"]],
-        "total_results": len(res["matches"])
+        "sources": [md["title"] for md in metadatas],
+        "links": [md.get("link", "") for md in metadatas],
+        "total_results": len(metadatas)
     }
+    # Don't pin the metadata fallback in the cache while Gemini is failing
+    if answered_by_gemini:
+        semantic_cache.put(scope, q, emb, response)
+    return response
 
 # -------------------
 # Knowledge Graph APIs with Image Support
@@ -187,7 +376,9 @@ try:
         get_images_for_publication,
         search_publications_with_images,
         get_knowledge_graph_stats,
+        merge_publications_metadata,
         test_neo4j_connection,
+        get_driver,
         NEO4J_AVAILABLE
     )
 except ImportError:
@@ -249,59 +440,98 @@ def store_publication_with_images(
         return {"error": str(e)}
 
 @app.get("/neo4j/publication/{pub_id}/images")
-def get_publication_images(pub_id: str):
+async def get_publication_images(pub_id: str):
     """Retrieve images for a specific publication"""
     if not NEO4J_AVAILABLE:
         return {"error": "Neo4j not available"}
     
     try:
-        from logic.kg_neo4j_images import driver
-        with driver.session() as session:
-            images = session.read_transaction(get_images_for_publication, pub_id)
-            return {"publication_id": pub_id, "images": images}
+        images = await asyncio.to_thread(_read_neo4j, get_images_for_publication, pub_id)
+        return {"publication_id": pub_id, "images": images}
     except Exception as e:
         return {"error": str(e)}
 
+def _read_neo4j(work, *args):
+    """Run a read transaction function on a pooled driver session (blocking)."""
+    with get_driver().session() as session:
+        return session.execute_read(work, *args)
+
+def _write_neo4j_publications(matches):
+    """MERGE Pinecone matches as Publication nodes in one round trip (blocking)."""
+    rows = [
+        {
+            "id": match['id'],
+            "title": match['metadata']['title'],
+            "abstract": match['metadata'].get('abstract', ''),
+            "link": match['metadata'].get('link', ''),
+            "source": match['metadata']['source']
+        }
+        for match in matches
+    ]
+    with get_driver().session() as session:
+        session.execute_write(merge_publications_metadata, rows)
+
 @app.get("/neo4j/search")
-def search_kg_with_images(query: str, limit: int = 10):
+async def search_kg_with_images(query: str, limit: int = 10):
     """Smart knowledge graph search: Check Neo4j first, then generate with Gemini if needed"""
     if not NEO4J_AVAILABLE:
         return {"error": "Neo4j not available"}
     
+    scope = f"neo4j:{limit}"
+    cached = semantic_cache.get(scope, query)
+    if cached is not None:
+        # The hit may be for a differently-cased/spaced or similar query
+        return {**cached, "query": query}
+    
     try:
-        from logic.kg_neo4j_images import driver, test_neo4j_connection
-        
-        if not test_neo4j_connection():
+        if not await asyncio.to_thread(test_neo4j_connection):
             return {"error": "Neo4j not connected"}
         
         # Step 1: Search existing Neo4j data
-        with driver.session() as session:
-            existing_results = session.read_transaction(
-                search_publications_with_images, query, limit
-            )
-            
-            # If we have good results in Neo4j, return them
-            if existing_results and len(existing_results) >= 3:
-                return {
-                    "query": query,
-                    "results": existing_results,
-                    "source": "neo4j_existing"
-                }
+        existing_results = await asyncio.to_thread(
+            _read_neo4j, search_publications_with_images, query, limit
+        )
+        
+        # If we have good results in Neo4j, return them
+        if existing_results and len(existing_results) >= 3:
+            return {
+                "query": query,
+                "results": existing_results,
+                "source": "neo4j_existing"
+            }
         
         # Step 2: If Neo4j is empty or has few results, generate with Gemini + populate Neo4j
         print(f"Neo4j has limited results for '{query}', generating with Gemini...")
         
         # Get relevant publications from Pinecone
-        emb = embed_texts([query])[0]
-        pinecone_results = index.query(
+        emb = list(await asyncio.to_thread(embed_query, query))
+        cached = get_similar_cached("neo4j_search", scope, emb)
+        if cached is not None:
+            return {**cached, "query": query}
+        
+        pinecone_results = await query_index(
             vector=emb, 
             top_k=min(limit * 2, 10), 
             include_metadata=True,
+            include_values=False,
             filter={"source": {"$eq": "nasa_publications"}}
         )
         
+        # Both the Gemini-enhanced and the fallback responses list these hits
+        hits = [
+            {
+                'publication_id': match['id'],
+                'title': match['metadata']['title'],
+                'abstract': match['metadata'].get('abstract', ''),
+                'link': match['metadata'].get('link', ''),
+                'score': match['score'],
+                'images': []
+            }
+            for match in pinecone_results['matches']
+        ]
+        
         # Generate knowledge graph entries with Gemini
-        if gemini_client and pinecone_results['matches']:
+        if gemini_client and hits:
             context = "\n".join([
                 f"Title: {m['metadata']['title']}\nAbstract: {m['metadata'].get('abstract', '')}"
                 for m in pinecone_results['matches'][:5]
@@ -320,68 +550,32 @@ For each publication, identify:
 Return structured information that can be used to build a knowledge graph."""
 
             try:
-                resp = gemini_client.models.generate_content(
+                resp = await gemini_client.aio.models.generate_content(
                     model="gemini-2.5-flash-lite", contents=prompt
                 )
                 
                 # Store basic publication info in Neo4j for future searches
-                for match in pinecone_results['matches'][:5]:
-                    with driver.session() as session:
-                        session.write_transaction(
-                            lambda tx: tx.run("""
-                                MERGE (p:Publication {id: $id})
-                                SET p.title = $title,
-                                    p.abstract = $abstract,
-                                    p.link = $link,
-                                    p.source = $source,
-                                    p.indexed_at = datetime()
-                                RETURN p
-                            """, 
-                            id=match['id'],
-                            title=match['metadata']['title'],
-                            abstract=match['metadata'].get('abstract', ''),
-                            link=match['metadata'].get('link', ''),
-                            source=match['metadata']['source']
-                            )
-                        )
+                await asyncio.to_thread(
+                    _write_neo4j_publications, pinecone_results['matches'][:5]
+                )
                 
                 # Return Pinecone results enhanced with Gemini analysis
-                enhanced_results = []
-                for match in pinecone_results['matches']:
-                    enhanced_results.append({
-                        'publication_id': match['id'],
-                        'title': match['metadata']['title'],
-                        'abstract': match['metadata'].get('abstract', ''),
-                        'link': match['metadata'].get('link', ''),
-                        'score': match['score'],
-                        'images': []
-                    })
-                    
-                return {
+                response = {
                     "query": query,
-                    "results": enhanced_results,
+                    "results": hits,
                     "source": "gemini_enhanced",
                     "gemini_analysis": resp.text[:500] + "..." if len(resp.text) > 500 else resp.text
                 }
+                semantic_cache.put(scope, query, emb, response)
+                return response
                 
             except Exception as gemini_error:
                 print(f"Gemini generation failed: {gemini_error}")
         
         # Step 3: Fallback to Pinecone results if Gemini fails
-        fallback_results = []
-        for match in pinecone_results['matches']:
-            fallback_results.append({
-                'publication_id': match['id'],
-                'title': match['metadata']['title'],
-                'abstract': match['metadata'].get('abstract', ''),
-                'link': match['metadata'].get('link', ''),
-                'score': match['score'],
-                'images': []
-            })
-        
         return {
             "query": query,
-            "results": fallback_results,
+            "results": hits,
             "source": "pinecone_fallback"
         }
         
@@ -395,156 +589,123 @@ def get_graph_visualization_data(limit: int = 50):
         return {"error": "Neo4j not available"}
     
     try:
-        from logic.kg_neo4j_images import driver, test_neo4j_connection
-        
         if not test_neo4j_connection():
             return {"error": "Neo4j not connected"}
         
         nodes = []
         edges = []
         
-        with driver.session() as session:
-            # Get Publications as nodes
-            pub_result = session.run("""
+        with get_driver().session() as session:
+            # Publications, entities and their relationships in one round trip;
+            # each UNION branch keeps its own LIMIT and is tagged by `kind`
+            result = session.run("""
                 MATCH (p:Publication)
-                RETURN p.id as id, p.title as title, p.source as source
+                RETURN 'publication' as kind, p.id as id, p.title as name, p.source as detail, null as mentions
                 LIMIT $limit
-            """, limit=limit)
-            
-            for record in pub_result:
-                nodes.append({
-                    "data": {
-                        "id": record["id"],
-                        "label": record["title"][:50] + "..." if len(record["title"]) > 50 else record["title"],
-                        "type": "publication",
-                        "source": record["source"]
-                    }
-                })
-            
-            # Get Entities as nodes and their relationships
-            entity_result = session.run("""
+                UNION ALL
                 MATCH (e:Entity)
-                RETURN e.name as name, e.type as type, e.mentions as mentions
+                RETURN 'entity' as kind, null as id, e.name as name, e.type as detail, e.mentions as mentions
                 LIMIT $limit
-            """, limit=limit)
-            
-            for record in entity_result:
-                nodes.append({
-                    "data": {
-                        "id": f"entity_{record['name']}",
-                        "label": record["name"],
-                        "type": "entity",
-                        "entity_type": record["type"],
-                        "mentions": record.get("mentions", 1)
-                    }
-                })
-            
-            # Get relationships between entities and publications
-            rel_result = session.run("""
+                UNION ALL
                 MATCH (p:Publication)-[r]->(e:Entity)
-                RETURN p.id as source, e.name as target, type(r) as relationship
+                RETURN 'relationship' as kind, p.id as id, e.name as name, type(r) as detail, null as mentions
                 LIMIT $limit
             """, limit=limit)
             
-            for record in rel_result:
-                edges.append({
-                    "data": {
-                        "id": f"{record['source']}-{record['target']}",
-                        "source": record["source"],
-                        "target": f"entity_{record['target']}",
-                        "relationship": record["relationship"]
-                    }
-                })
+            for record in result:
+                kind = record["kind"]
+                if kind == "publication":
+                    # Publications as nodes
+                    nodes.append({
+                        "data": {
+                            "id": record["id"],
+                            "label": record["name"][:50] + "..." if len(record["name"]) > 50 else record["name"],
+                            "type": "publication",
+                            "source": record["detail"]
+                        }
+                    })
+                elif kind == "entity":
+                    # Entities as nodes
+                    nodes.append({
+                        "data": {
+                            "id": f"entity_{record['name']}",
+                            "label": record["name"],
+                            "type": "entity",
+                            "entity_type": record["detail"],
+                            "mentions": record["mentions"]
+                        }
+                    })
+                else:
+                    # Relationships between publications and entities
+                    edges.append({
+                        "data": {
+                            "id": f"{record['id']}-{record['name']}",
+                            "source": record["id"],
+                            "target": f"entity_{record['name']}",
+                            "relationship": record["detail"]
+                        }
+                    })
             
             # If no relationships exist, create semantic connections based on title similarity
             if not edges and nodes:
                 # Create connections between publications based on common terms
                 pub_nodes = [n for n in nodes if n["data"]["type"] == "publication"]
+                pub_ids = [pub["data"]["id"] for pub in pub_nodes]
+                titles = [pub["data"].get("label", "").lower() for pub in pub_nodes]
                 
-                # Create connections between publications with similar topics
-                for i, pub1 in enumerate(pub_nodes):
-                    for j, pub2 in enumerate(pub_nodes[i+1:], i+1):
-                        title1_words = set(pub1["data"]["label"].lower().split())
-                        title2_words = set(pub2["data"]["label"].lower().split())
-                        common_words = title1_words.intersection(title2_words)
-                        
-                        # Remove common stop words for better matching
-                        stop_words = {'the', 'and', 'of', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'from', 'as', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'must', 'shall', 'a', 'an', 'study', 'effect', 'analysis', 'research', 'investigation'}
-                        meaningful_words1 = title1_words - stop_words
-                        meaningful_words2 = title2_words - stop_words
-                        meaningful_common = meaningful_words1.intersection(meaningful_words2)
-                        
-                        # Create connection if they share meaningful words
-                        if len(meaningful_common) >= 1:  # If they share 1+ meaningful words
-                            edges.append({
-                                "data": {
-                                    "id": f"{pub1['data']['id']}-{pub2['data']['id']}",
-                                    "source": pub1["data"]["id"],
-                                    "target": pub2["data"]["id"],
-                                    "relationship": "RELATED",
-                                    "strength": len(meaningful_common)
-                                }
-                            })
+                # Publication x word incidence matrix (stop words removed for
+                # better matching); one matmul counts shared words for every pair
+                title_words = [set(title.split()) - GRAPH_STOP_WORDS for title in titles]
+                vocab = {word: k for k, word in enumerate(set().union(*title_words))}
+                word_matrix = np.zeros((len(pub_nodes), len(vocab)), dtype=np.float32)
+                for i, words in enumerate(title_words):
+                    word_matrix[i, [vocab[word] for word in words]] = 1
+                shared_words = word_matrix @ word_matrix.T
+                
+                # Create connection if they share 1+ meaningful words
+                for i, j in zip(*np.nonzero(np.triu(shared_words, 1) >= 1)):
+                    edges.append({
+                        "data": {
+                            "id": f"{pub_ids[i]}-{pub_ids[j]}",
+                            "source": pub_ids[i],
+                            "target": pub_ids[j],
+                            "relationship": "RELATED",
+                            "strength": int(shared_words[i, j])
+                        }
+                    })
                 
                 # Also create connections based on research topics
-                research_topics = {
-                    'microgravity': ['microgravity', 'weightlessness', 'gravity', 'spaceflight'],
-                    'radiation': ['radiation', 'cosmic', 'particle', 'irradiation'],
-                    'bone': ['bone', 'skeletal', 'osteo', 'calcium'],
-                    'muscle': ['muscle', 'muscular', 'atrophy', 'myofiber'],
-                    'cell': ['cell', 'cellular', 'molecular', 'mitochondria'],
-                    'plant': ['plant', 'botany', 'growth', 'arabidopsis'],
-                    'protein': ['protein', 'enzyme', 'metabolism', 'synthesis'],
-                    'dna': ['dna', 'genetic', 'genome', 'chromosome']
-                }
+                topic_names = list(GRAPH_TOPIC_PATTERNS)
+                
+                edge_ids = {edge["data"]["id"] for edge in edges}
                 
-                for pub in pub_nodes:
-                    try:
-                        pub_title = pub.get("data", {}).get("label", "").lower()
-                        if not pub_title:
-                            continue
-                            
-                        pub_topics = []
-                        
-                        for topic, keywords in research_topics.items():
-                            if any(keyword in pub_title for keyword in keywords):
-                                pub_topics.append(topic)
-                        
-                        # Connect publications with same research topics
-                        for other_pub in pub_nodes:
-                            try:
-                                if other_pub.get("data", {}).get("id") != pub.get("data", {}).get("id"):
-                                    other_title = other_pub.get("data", {}).get("label", "").lower()
-                                    if not other_title:
-                                        continue
-                                        
-                                    other_topics = []
-                                    
-                                    for topic, keywords in research_topics.items():
-                                        if any(keyword in other_title for keyword in keywords):
-                                            other_topics.append(topic)
-                                    
-                                    # If they share research topics, create connection
-                                    shared_topics = set(pub_topics).intersection(set(other_topics))
-                                    if shared_topics:
-                                        edge_id = f"{pub['data']['id']}-{other_pub['data']['id']}"
-                                        # Check if edge already exists
-                                        if not any(edge.get("data", {}).get("id") == edge_id for edge in edges):
-                                            edges.append({
-                                                "data": {
-                                                    "id": edge_id,
-                                                    "source": pub["data"]["id"],
-                                                    "target": other_pub["data"]["id"],
-                                                    "relationship": f"SHARES_TOPIC_{list(shared_topics)[0].upper()}",
-                                                    "topics": list(shared_topics)
-                                                }
-                                            })
-                            except Exception as inner_e:
-                                print(f"Error processing publication pair: {str(inner_e)}")
-                                continue
-                    except Exception as outer_e:
-                        print(f"Error processing publication: {str(outer_e)}")
+                # Publication x topic membership matrix, matched once per title
+                # instead of once per pair; its Gram matrix gives shared topics
+                topic_matrix = np.zeros((len(pub_nodes), len(topic_names)), dtype=np.float32)
+                for i, title in enumerate(titles):
+                    for k, pattern in enumerate(GRAPH_TOPIC_PATTERNS.values()):
+                        if pattern.search(title):
+                            topic_matrix[i, k] = 1
+                shared_topic_counts = topic_matrix @ topic_matrix.T
+                
+                # Connect publications with same research topics
+                for i, j in zip(*np.nonzero(shared_topic_counts)):
+                    if pub_ids[i] == pub_ids[j]:
                         continue
+                    edge_id = f"{pub_ids[i]}-{pub_ids[j]}"
+                    # Check if edge already exists
+                    if edge_id not in edge_ids:
+                        edge_ids.add(edge_id)
+                        shared_topics = [topic_names[k] for k in np.flatnonzero(topic_matrix[i] * topic_matrix[j])]
+                        edges.append({
+                            "data": {
+                                "id": edge_id,
+                                "source": pub_ids[i],
+                                "target": pub_ids[j],
+                                "relationship": f"SHARES_TOPIC_{shared_topics[0].upper()}",
+                                "topics": shared_topics
+                            }
+                        })
         
         # If no data in Neo4j, create sample graph from recent searches
         if not nodes:
@@ -602,125 +763,123 @@ def get_graph_visualization_data(limit: int = 50):
         print(f"Full traceback:\n{error_details}")
         return {"error": str(e), "details": error_details}
 
+# Latest /neo4j/stats payload, kept fresh by refresh_stats_periodically()
+# (started from the app lifespan) so requests don't wait on Neo4j/Pinecone
+STATS_REFRESH_INTERVAL = 300  # seconds
+STATS_CACHE = None  # replaced wholesale on each successful refresh, never mutated
+
+# Served (never cached) when neither Neo4j nor Pinecone can produce stats
+FALLBACK_KG_STATS = {
+    "knowledge_graph_stats": {
+        "pub_count": 607,  # Based on your earlier data
+        "entity_count": 150,  # Estimated
+        "image_count": 0,
+        "finding_count": 607
+    }
+}
+
+async def refresh_stats_periodically():
+    """Recompute the knowledge graph statistics every STATS_REFRESH_INTERVAL seconds."""
+    global STATS_CACHE
+    while True:
+        try:
+            STATS_CACHE = await _compute_kg_statistics()
+        except Exception as e:
+            print(f"⚠️  Warning: Stats refresh failed: {e}")
+        await asyncio.sleep(STATS_REFRESH_INTERVAL)
+
 @app.get("/neo4j/stats")
-def get_kg_statistics():
+async def get_kg_statistics():
     """Get knowledge graph statistics"""
+    if STATS_CACHE is not None:
+        return STATS_CACHE
+    # Background refresher not running (or not finished its first pass yet)
     try:
-        if NEO4J_AVAILABLE:
-            from logic.kg_neo4j_images import driver, test_neo4j_connection
-            if test_neo4j_connection():
-                with driver.session() as session:
-                    stats = session.read_transaction(get_knowledge_graph_stats)
-                    return {"knowledge_graph_stats": stats}
-        
-        # Fallback: Generate stats from Pinecone data
-        sample_results = index.query(
-            vector=[0.1] * 1024,
-            top_k=100,
-            include_metadata=True,
-            filter={"source": {"$eq": "nasa_publications"}}
-        )
-        
-        # Get total count from index stats
-        index_stats = index.describe_index_stats()
-        total_publications = index_stats.total_vector_count if hasattr(index_stats, 'total_vector_count') else len(sample_results['matches'])
-        
-        # Extract entities from publication titles
-        entities = Counter()
-        for match in sample_results['matches']:
-            title = match['metadata'].get('title', '')
-            # Simple entity extraction (can be improved with NLP)
-            words = [w.lower().strip() for w in title.split() if len(w) > 3 and w.isalpha()]
-            entities.update(words)
-        
-        entity_count = len([k for k, v in entities.items() if v >= 2])  # Entities mentioned at least twice
-        
-        fallback_stats = {
-            "pub_count": total_publications,
-            "entity_count": entity_count,
-            "image_count": 0,  # Not available in Pinecone fallback
-            "finding_count": total_publications  # Each publication is considered a finding
-        }
-        
-        return {"knowledge_graph_stats": fallback_stats}
-        
+        return await cached_response("kg:stats:v1", _compute_kg_statistics)
     except Exception as e:
-        # Ultimate fallback
-        return {
-            "knowledge_graph_stats": {
-                "pub_count": 607,  # Based on your earlier data
-                "entity_count": 150,  # Estimated
-                "image_count": 0,
-                "finding_count": 607
-            }
-        }
+        print(f"⚠️  Warning: Could not compute stats: {e}")
+        return FALLBACK_KG_STATS
+
+async def _compute_kg_statistics():
+    """Stats from Neo4j, or estimated from Pinecone; raises if both fail"""
+    if NEO4J_AVAILABLE and await asyncio.to_thread(test_neo4j_connection):
+        stats = await asyncio.to_thread(_read_neo4j, get_knowledge_graph_stats)
+        return {"knowledge_graph_stats": stats}
+    
+    # Fallback: Generate stats from Pinecone data
+    sample_matches = await get_sample_matches(100)
+    
+    # Get total count from index stats
+    index_stats = await get_index_stats()
+    total_publications = index_stats.total_vector_count if hasattr(index_stats, 'total_vector_count') else len(sample_matches)
+    
+    # Extract entities from publication titles
+    # Simple entity extraction (can be improved with NLP)
+    entities = Counter(
+        word
+        for match in sample_matches
+        for word in ALPHA_WORD_RE.findall(match['metadata'].get('title', '').lower())
+    )
+    
+    entity_count = len([k for k, v in entities.items() if v >= 2])  # Entities mentioned at least twice
+    
+    fallback_stats = {
+        "pub_count": total_publications,
+        "entity_count": entity_count,
+        "image_count": 0,  # Not available in Pinecone fallback
+        "finding_count": total_publications  # Each publication is considered a finding
+    }
+    
+    return {"knowledge_graph_stats": fallback_stats}
 
 # -------------------
 # Basic Knowledge Graph APIs (Pinecone-based fallback)
 # -------------------
 @app.get("/knowledge-graph/entities")
-def kg_entities(top_n: int = 20):
+async def kg_entities(top_n: int = 20):
     """Extract entities from publication titles (basic NLP)"""
+    return await cached_response(f"kg:entities:v1:{top_n}", lambda: _compute_kg_entities(top_n))
+
+async def _compute_kg_entities(top_n):
     try:
-        sample_results = index.query(
-            vector=[0.1] * 1024,
-            top_k=min(100, top_n * 5),
-            include_metadata=True,
-            filter={"source": {"$eq": "nasa_publications"}}
-        )
+        sample_matches = await get_sample_matches(min(100, top_n * 5))
         entities = Counter()
-        for match in sample_results['matches']:
+        for match in sample_matches:
             title = match['metadata']['title']
-            words = title.split()
-            for word in words:
-                clean_word = word.strip('.,()[]').strip()
-                if (len(clean_word) > 2 and 
-                    clean_word[0].isupper() and 
-                    clean_word.lower() not in ['and', 'the', 'for', 'with', 'from', 'effects', 'study']):
-                    entities[clean_word] += 1
+            entities.update(
+                word
+                for word in (token.strip(TITLE_PUNCTUATION) for token in title.split())
+                if len(word) > 2 and word[0].isupper() and word.lower() not in STOPWORDS
+            )
         
         return {
             "entities": [{"name": name, "count": count} for name, count in entities.most_common(top_n)],
-            "total_publications_analyzed": len(sample_results['matches']),
+            "total_publications_analyzed": len(sample_matches),
             "note": "Basic entity extraction from titles. Install Neo4j for advanced knowledge graph."
         }
     except Exception as e:
         return {"error": f"Entity extraction failed: {str(e)}"}
 
 @app.get("/knowledge-graph/topics")
-def kg_topics(top_n: int = 10):
+async def kg_topics(top_n: int = 10):
     """Identify common research topics"""
+    return await cached_response(f"kg:topics:v1:{top_n}", lambda: _compute_kg_topics(top_n))
+
+async def _compute_kg_topics(top_n):
     try:
-        sample_results = index.query(
-            vector=[0.1] * 1024,
-            top_k=min(200, top_n * 10),
-            include_metadata=True,
-            filter={"source": {"$eq": "nasa_publications"}}
-        )
-        topics = {
-            "microgravity": ["microgravity", "weightlessness", "gravity"],
-            "radiation": ["radiation", "cosmic", "particle"],
-            "bone": ["bone", "skeletal", "osteo"],
-            "muscle": ["muscle", "muscular", "atrophy"],
-            "cardiovascular": ["cardiovascular", "heart", "blood"],
-            "plant": ["plant", "botany", "growth"],
-            "cell": ["cell", "cellular", "molecular"],
-            "astronaut": ["astronaut", "crew", "human"],
-            "space": ["space", "spaceflight", "orbital"],
-            "biology": ["biology", "biological", "biomedical"]
-        }
-        
+        sample_matches = await get_sample_matches(min(200, top_n * 10))
         topic_counts = Counter()
         
-        for match in sample_results['matches']:
+        for match in sample_matches:
             title = match['metadata']['title'].lower()
-            for topic, keywords in topics.items():
-                if any(keyword in title for keyword in keywords):
-                    topic_counts[topic] += 1
+            topic_counts.update(
+                topic for topic, pattern in KG_TOPIC_PATTERNS.items()
+                if pattern.search(title)
+            )
         
         return {
             "topics": dict(topic_counts.most_common(top_n)),
-            "total_analyzed": len(sample_results['matches']),
+            "total_analyzed": len(sample_matches),
             "note": "Topic analysis based on keyword matching"
         }
     except Exception as e:
@@ -730,24 +889,24 @@ def kg_topics(top_n: int = 10):
 # Analytics API
 # -------------------
 @app.get("/trends")
-def trends():
+async def trends():
     """Get publication trends and statistics from Pinecone database"""
+    return await cached_response("trends:v1", _compute_trends)
+
+async def _compute_trends():
     try:
-        stats = index.describe_index_stats()
+        stats = await get_index_stats()
         total_pubs = stats.get('total_vector_count', 0)
-        sample_results = index.query(
-            vector=[0.1] * 1024,
-            top_k=min(100, total_pubs),
-            include_metadata=True,
-            filter={"source": {"$eq": "nasa_publications"}}
+        sample_matches = await get_sample_matches(min(100, total_pubs))
+        all_titles = [match['metadata']['title'] for match in sample_matches]
+        # The length and stopword checks apply to the word before punctuation
+        # is stripped; the Counter consumes one stream
+        common_terms = Counter(
+            word.lower().strip(TITLE_PUNCTUATION)
+            for title in all_titles
+            for word in title.split()
+            if len(word) > 3 and word.lower() not in TRENDS_STOPWORDS
         )
-        all_titles = [match['metadata']['title'] for match in sample_results['matches']]
-        common_terms = Counter()
-        
-        for title in all_titles:
-            words = [word.lower().strip('.,()[]') for word in title.split() 
-                    if len(word) > 3 and word.lower() not in ['and', 'the', 'for', 'with', 'from']]
-            common_terms.update(words)
         
         return {
             "total_publications": total_pubs,
@@ -1,10 +1,23 @@
 import sqlite3
 import hashlib
+import hmac
 import secrets
 import os
-from datetime import datetime, timedelta
+import time
+import threading
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 import jwt
+from cachetools import TTLCache
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import VerificationError, InvalidHashError
+    # OWASP-recommended Argon2id parameters (19 MiB, 2 passes)
+    _password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+except ImportError:
+    print("⚠️  Warning: argon2-cffi not installed. Falling back to PBKDF2 password hashing.")
+    _password_hasher = None
 
 # Database configuration
 DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'users.db')
@@ -14,12 +27,41 @@ if not JWT_SECRET:
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24
 
+# Successful verify_token results keyed by hash_token(token) -> (expires_at, user).
+# A logout from another process is honoured after at most TOKEN_CACHE_TTL seconds.
+TOKEN_CACHE_TTL = 30
+_token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL)
+_token_cache_lock = threading.RLock()
+
+# token_hash -> expires_at of logged-out sessions that haven't expired yet.
+# verify_token checks this instead of joining user_sessions on every call; it
+# is reloaded from the database every REVOKED_REFRESH_SECONDS so logouts
+# handled by other worker processes are picked up (and expired ones dropped).
+REVOKED_REFRESH_SECONDS = 30
+_revoked: Dict[str, datetime] = {}
+_revoked_loaded_at = 0.0
+_revoked_lock = threading.Lock()
+
+# One long-lived connection per thread (sqlite3 connections can't be shared
+# across threads), so requests skip the open + schema parse of a fresh connect
+_tls = threading.local()
+
+def _get_conn() -> sqlite3.Connection:
+    """Return this thread's autocommit connection, opening it on first use"""
+    conn = getattr(_tls, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        _tls.conn = conn
+    return conn
+
 def init_database():
     """Initialize the SQLite database with users table"""
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = _get_conn().cursor()
     
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -46,26 +88,73 @@ def init_database():
         )
     ''')
     
-    conn.commit()
-    conn.close()
+    # Logout and revocation lookups go by token hash
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_token ON user_sessions(token_hash)')
+
+def load_revoked_tokens():
+    """Reload the revoked-token table from logged-out, unexpired sessions"""
+    global _revoked_loaded_at
+    now = datetime.utcnow()
+    rows = _get_conn().execute('''
+        SELECT token_hash, expires_at FROM user_sessions
+        WHERE is_active = 0 AND expires_at > ?
+    ''', (now,)).fetchall()
+    with _revoked_lock:
+        # Merge into the live dict rather than replacing it, so a logout
+        # recorded while the query ran isn't lost
+        _revoked.update((token_hash, datetime.fromisoformat(expires_at)) for token_hash, expires_at in rows)
+        _drop_expired_revocations(now)
+        _revoked_loaded_at = time.time()
+
+def _drop_expired_revocations(now: datetime):
+    """Forget revoked tokens that have expired anyway (call with _revoked_lock held)"""
+    for expired in [h for h, expires_at in _revoked.items() if expires_at <= now]:
+        del _revoked[expired]
+
+def is_token_revoked(token_hash: str) -> bool:
+    """Check the revoked-token table, refreshing it when it has gone stale"""
+    if time.time() - _revoked_loaded_at > REVOKED_REFRESH_SECONDS:
+        load_revoked_tokens()
+    return token_hash in _revoked
+
+def _pbkdf2_hash(password: str, salt: str) -> str:
+    """Legacy PBKDF2-SHA256 hash, kept to verify (and migrate) older rows"""
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000).hex()
 
 def hash_password(password: str, salt: str = None) -> tuple:
-    """Hash password with salt"""
+    """Hash password with salt
+    
+    Uses Argon2id when available; its salt is embedded in the hash, so the
+    returned salt is empty. Falls back to salted PBKDF2 otherwise.
+    """
+    if _password_hasher is not None and salt is None:
+        return _password_hasher.hash(password), ""
     if salt is None:
         salt = secrets.token_hex(16)
-    
-    password_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-    return password_hash.hex(), salt
+    return _pbkdf2_hash(password, salt), salt
 
 def verify_password(password: str, password_hash: str, salt: str) -> bool:
-    """Verify password against hash"""
-    test_hash, _ = hash_password(password, salt)
-    return test_hash == password_hash
+    """Verify password against hash (Argon2 or legacy PBKDF2)"""
+    if password_hash.startswith("$argon2"):
+        if _password_hasher is None:
+            return False
+        try:
+            return _password_hasher.verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return hmac.compare_digest(_pbkdf2_hash(password, salt), password_hash)
+
+def password_needs_rehash(password_hash: str) -> bool:
+    """True for PBKDF2 or outdated Argon2 hashes once Argon2 is available"""
+    if _password_hasher is None:
+        return False
+    if not password_hash.startswith("$argon2"):
+        return True
+    return _password_hasher.check_needs_rehash(password_hash)
 
 def create_user(username: str, email: str, password: str) -> Dict[str, Any]:
     """Create a new user"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = _get_conn().cursor()
     
     try:
         # Check if user already exists
@@ -83,7 +172,6 @@ def create_user(username: str, email: str, password: str) -> Dict[str, Any]:
         ''', (username, email, password_hash, salt))
         
         user_id = cursor.lastrowid
-        conn.commit()
         
         return {
             "success": True,
@@ -92,15 +180,11 @@ def create_user(username: str, email: str, password: str) -> Dict[str, Any]:
         }
         
     except Exception as e:
-        conn.rollback()
         return {"success": False, "message": f"Error creating user: {str(e)}"}
-    finally:
-        conn.close()
 
 def authenticate_user(username: str, password: str) -> Dict[str, Any]:
     """Authenticate user and return JWT token"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = _get_conn().cursor()
     
     try:
         # Get user data
@@ -122,6 +206,14 @@ def authenticate_user(username: str, password: str) -> Dict[str, Any]:
         if not verify_password(password, password_hash, salt):
             return {"success": False, "message": "Invalid credentials"}
         
+        # Upgrade PBKDF2 / outdated hashes now that we have the plaintext
+        if password_needs_rehash(password_hash):
+            new_hash, new_salt = hash_password(password)
+            cursor.execute(
+                'UPDATE users SET password_hash = ?, salt = ? WHERE id = ?',
+                (new_hash, new_salt, user_id)
+            )
+        
         # Generate JWT token
         payload = {
             'user_id': user_id,
@@ -134,7 +226,7 @@ def authenticate_user(username: str, password: str) -> Dict[str, Any]:
         token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
         
         # Store session
-        token_hash = hashlib.sha256(token.encode()).hexdigest()
+        token_hash = hash_token(token)
         expires_at = datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
         
         cursor.execute('''
@@ -142,8 +234,6 @@ def authenticate_user(username: str, password: str) -> Dict[str, Any]:
             VALUES (?, ?, ?)
         ''', (user_id, token_hash, expires_at))
         
-        conn.commit()
-        
         return {
             "success": True,
             "message": "Authentication successful",
@@ -157,71 +247,87 @@ def authenticate_user(username: str, password: str) -> Dict[str, Any]:
         
     except Exception as e:
         return {"success": False, "message": f"Authentication error: {str(e)}"}
-    finally:
-        conn.close()
 
-def verify_token(token: str) -> Dict[str, Any]:
-    """Verify JWT token and return user data"""
+def hash_token(token: str) -> str:
+    """SHA-256 hex digest identifying a token in user_sessions and the caches"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def verify_token(token: str, token_hash: str = None) -> Dict[str, Any]:
+    """Verify JWT token and return user data
+    
+    Successful results are cached for up to TOKEN_CACHE_TTL seconds (never past
+    the token's exp), skipping the decode and revocation check on repeat calls.
+    Invalid or expired tokens are never cached. Callers that already computed
+    hash_token(token) can pass it as token_hash.
+    """
+    key = token_hash or hash_token(token)
+    with _token_cache_lock:
+        entry = _token_cache.get(key)
+    if entry is not None:
+        expires_at, user = entry
+        if expires_at > time.time():
+            return {"success": True, "user": dict(user)}
+        with _token_cache_lock:
+            _token_cache.pop(key, None)
+    
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         
-        # Check if session exists and is active
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        token_hash = hashlib.sha256(token.encode()).hexdigest()
-        cursor.execute('''
-            SELECT us.id, u.id, u.username, u.email, u.is_active
-            FROM user_sessions us
-            JOIN users u ON us.user_id = u.id
-            WHERE us.token_hash = ? AND us.is_active = 1 AND us.expires_at > ?
-        ''', (token_hash, datetime.utcnow()))
-        
-        session = cursor.fetchone()
-        conn.close()
-        
-        if not session:
+        # The signed exp already bounds the session; only logout can end it early
+        if is_token_revoked(key):
             return {"success": False, "message": "Invalid or expired token"}
         
-        return {
-            "success": True,
-            "user": {
-                "id": payload['user_id'],
-                "username": payload['username'],
-                "email": payload['email']
-            }
+        user = {
+            "id": payload['user_id'],
+            "username": payload['username'],
+            "email": payload['email']
         }
+        with _token_cache_lock:
+            _token_cache[key] = (min(payload['exp'], time.time() + TOKEN_CACHE_TTL), user)
+        
+        return {"success": True, "user": dict(user)}
         
     except jwt.ExpiredSignatureError:
         return {"success": False, "message": "Token has expired"}
     except jwt.InvalidTokenError:
         return {"success": False, "message": "Invalid token"}
 
-def logout_user(token: str) -> Dict[str, Any]:
+def logout_user(token: str, token_hash: str = None) -> Dict[str, Any]:
     """Logout user by deactivating session"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        cursor = _get_conn().cursor()
         
-        token_hash = hashlib.sha256(token.encode()).hexdigest()
+        token_hash = token_hash or hash_token(token)
+        with _token_cache_lock:
+            _token_cache.pop(token_hash, None)
         cursor.execute('''
             UPDATE user_sessions 
             SET is_active = 0 
             WHERE token_hash = ? AND is_active = 1
         ''', (token_hash,))
         
-        conn.commit()
-        conn.close()
+        # Revoke locally right away; other processes see it on their next reload
+        now = datetime.utcnow()
+        with _revoked_lock:
+            _revoked[token_hash] = _token_expiry(token)
+            _drop_expired_revocations(now)
         
         return {"success": True, "message": "Logged out successfully"}
         
     except Exception as e:
         return {"success": False, "message": f"Logout error: {str(e)}"}
 
+def _token_expiry(token: str) -> datetime:
+    """exp claim of a token as a naive UTC datetime (signature not checked)"""
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False})['exp']
+        return datetime.fromtimestamp(exp, tz=timezone.utc).replace(tzinfo=None)
+    except (jwt.InvalidTokenError, KeyError):
+        return datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
+
 def get_user_by_id(user_id: int) -> Dict[str, Any]:
     """Get user by ID"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = _get_conn().cursor()
     
     try:
         cursor.execute('''
@@ -246,8 +352,7 @@ def get_user_by_id(user_id: int) -> Dict[str, Any]:
         
     except Exception as e:
         return {"success": False, "message": f"Error fetching user: {str(e)}"}
-    finally:
-        conn.close()
 
 # Initialize database on import
 init_database()
+load_revoked_tokens()
@@ -0,0 +1,202 @@
+"""Cache-aside helpers for the aggregate (trends / knowledge graph) endpoints.
+
+Uses Redis when REDIS_URL is set so all workers share one cache, otherwise
+falls back to a per-process TTL dict. SemanticCache fronts the per-query
+endpoints (/search, /qa, /neo4j/search).
+"""
+import os
+import time
+import asyncio
+import numpy as np
+import orjson
+from cachetools import TLRUCache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:
+    aioredis = None
+    RedisError = Exception
+
+REDIS_URL = os.getenv("REDIS_URL")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "600"))  # seconds
+SEMANTIC_CACHE_SIZE = 1024  # recent queries kept per process
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # cosine similarity counted as "same question"
+LOCK_TTL = 30  # seconds a recompute may hold the stampede lock
+LOCK_WAIT = 5  # seconds other requests wait for that recompute
+LOCAL_CACHE_SIZE = 256  # responses kept by the in-process fallback
+
+redis_client = None
+if REDIS_URL:
+    if aioredis is None:
+        print("⚠️  Warning: REDIS_URL set but redis package not installed. Using in-process cache.")
+    else:
+        try:
+            redis_client = aioredis.from_url(REDIS_URL)
+        except Exception as e:
+            print(f"⚠️  Warning: Redis initialization failed: {e}. Using in-process cache.")
+
+# key -> (expires_at, payload); entries expire at their own expires_at and the
+# least recently used are evicted past LOCAL_CACHE_SIZE
+_local_cache = TLRUCache(maxsize=LOCAL_CACHE_SIZE, ttu=lambda _key, entry, _now: entry[0])
+_local_locks = {}  # key -> asyncio.Lock, only while a recompute is in progress
+
+
+def _cacheable(result) -> bool:
+    """Don't cache the endpoints' {"error": ...} responses."""
+    return not (isinstance(result, dict) and "error" in result)
+
+
+async def _redis_cached_response(key, compute, ttl):
+    cached = await redis_client.get(key)
+    if cached:
+        return orjson.loads(cached)
+
+    # Only one worker recomputes an expired key; the rest wait for its result
+    lock_key = f"lock:{key}"
+    got_lock = await redis_client.set(lock_key, b"1", nx=True, ex=LOCK_TTL)
+    if not got_lock:
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            cached = await redis_client.get(key)
+            if cached:
+                return orjson.loads(cached)
+
+    try:
+        result = await compute()
+        if _cacheable(result):
+            await redis_client.set(key, orjson.dumps(result), ex=ttl)
+        return result
+    finally:
+        if got_lock:
+            await redis_client.delete(lock_key)
+
+
+async def _local_cached_response(key, compute, ttl):
+    entry = _local_cache.get(key)
+    if entry:
+        return entry[1]
+
+    lock = _local_locks.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            # Another request may have filled the entry while we waited
+            entry = _local_cache.get(key)
+            if entry:
+                return entry[1]
+
+            result = await compute()
+            if _cacheable(result):
+                _local_cache[key] = (time.monotonic() + ttl, result)
+            return result
+    finally:
+        if _local_locks.get(key) is lock:
+            del _local_locks[key]
+
+
+async def cached_response(key, compute, ttl=RESPONSE_CACHE_TTL):
+    """Return the cached response for key, or await compute() and cache it.
+
+    Args:
+        key: Cache key, e.g. "trends:v1" (bump the version when the shape changes)
+        compute: Zero-arg coroutine function producing the JSON-serializable response
+        ttl: Seconds to keep the response
+    """
+    if redis_client is not None:
+        try:
+            return await _redis_cached_response(key, compute, ttl)
+        except RedisError as e:
+            print(f"⚠️  Redis cache unavailable ({e}), serving uncached")
+            return await compute()
+    return await _local_cached_response(key, compute, ttl)
+
+
+class SemanticCache:
+    """Per-process cache of query responses, matched exactly or by embedding.
+
+    Exact hits are looked up by normalized query text before anything is
+    embedded. Otherwise the query embedding is compared against the last
+    `capacity` cached embeddings with one matrix-vector product, and the
+    closest entry in the same scope is returned if its cosine similarity is
+    at least `threshold`. Entries are evicted FIFO and expire after `ttl`.
+
+    A scope (e.g. "search:5:nasa_publications") separates requests whose
+    answers differ for the same question, such as different top_k values.
+
+    Cached embeddings are stored as int8 with a per-row scale (symmetric
+    quantization), a quarter of the float32 footprint; the query itself stays
+    float32, so similarities are only off by the rows' rounding error.
+    Only call this from the event loop; it is not thread-safe.
+    """
+
+    def __init__(self, capacity=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 ttl=RESPONSE_CACHE_TTL, dim=1024):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self._matrix = np.zeros((capacity, dim), dtype=np.int8)  # quantized unit rows
+        self._row_scales = np.zeros(capacity, dtype=np.float32)  # int8 -> float factor
+        self._scopes = np.full(capacity, -1, dtype=np.int32)
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._responses = [None] * capacity
+        self._keys = [None] * capacity
+        self._exact = {}  # (scope, normalized text) -> slot
+        self._scope_ids = {}
+        self._next = 0  # ring-buffer slot overwritten by the next put()
+
+    @staticmethod
+    def normalize(text):
+        return " ".join(text.lower().split())
+
+    def get(self, scope, text):
+        """Exact-match lookup; returns the cached response or None."""
+        slot = self._exact.get((scope, self.normalize(text)))
+        if slot is None or self._expires[slot] <= time.monotonic():
+            return None
+        return self._responses[slot]
+
+    def get_similar(self, scope, embedding):
+        """Nearest-neighbour lookup within scope; returns a response or None."""
+        scope_id = self._scope_ids.get(scope)
+        if scope_id is None:
+            return None
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return None
+        sims = (self._matrix @ (query / norm)) * self._row_scales
+        sims[(self._scopes != scope_id) | (self._expires <= time.monotonic())] = -1.0
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+        return self._responses[best]
+
+    def put(self, scope, text, embedding, response):
+        """Store response for text/embedding, evicting the oldest entry."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return
+        slot = self._next
+        self._next = (slot + 1) % self.capacity
+        evicted = self._keys[slot]
+        if evicted is not None and self._exact.get(evicted) == slot:
+            del self._exact[evicted]
+
+        key = (scope, self.normalize(text))
+        previous = self._exact.get(key)
+        if previous is not None:
+            self._keys[previous] = None  # older copy stays reachable by similarity only
+        self._exact[key] = slot
+        self._keys[slot] = key
+        unit = vector / norm
+        peak = float(np.abs(unit).max())
+        self._matrix[slot] = np.round(unit * (127 / peak))
+        self._row_scales[slot] = peak / 127
+        self._scopes[slot] = self._scope_ids.setdefault(scope, len(self._scope_ids))
+        self._expires[slot] = time.monotonic() + self.ttl
+        self._responses[slot] = response
@@ -1,7 +1,6 @@
 import os
-import pandas as pd
-import numpy as np
 from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
 from dotenv import load_dotenv
 from pinecone import Pinecone
 import time
@@ -14,97 +13,110 @@ index = pc.Index("space-biology")
 
 # Import embedding function from utils
 from logic.utils import embed_texts
+from logic.ingest_progress import record_progress, reset_progress
+from logic.ingest_common import EMBED_CHUNK_SIZE, log, configure_logging, read_publications, group_rows_by_title
 
 def clear_index():
     """Clear the index to start fresh"""
     print("🧹 Clearing index to start fresh...")
     try:
         index.delete(delete_all=True)
+        reset_progress()
         print("✅ Index cleared!")
     except Exception as e:
         print(f"⚠️  Could not clear index: {e}")
 
-def embed_with_retry(text, max_retries=5):
-    """Embed text with rate limit handling"""
+# Seconds of rate-limit budget per embedded title (~92/minute, leaving buffer)
+SECONDS_PER_TITLE = 0.65
+
+def embed_with_retry(texts, max_retries=5):
+    """Embed a batch of texts with rate limit handling
+    
+    Returns one embedding per text, or None for texts that could not be
+    embedded. A batch failing for a reason other than rate limiting is split
+    in half and retried, so one bad title doesn't sink the whole batch.
+    """
     for attempt in range(max_retries):
         try:
-            return embed_texts([text])[0]
+            return embed_texts(texts)
         except Exception as e:
             error_str = str(e)
             if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
                 # Rate limited - wait and retry
                 wait_time = min(60 * (2 ** attempt), 120)  # Exponential backoff, max 2 min
-                print(f"\n   ⏳ Rate limited. Waiting {wait_time}s before retry {attempt+1}/{max_retries}...")
+                log.warning(f"⏳ Rate limited. Waiting {wait_time}s before retry {attempt+1}/{max_retries}...")
                 time.sleep(wait_time)
+            elif len(texts) > 1:
+                mid = len(texts) // 2
+                return embed_with_retry(texts[:mid], max_retries) + embed_with_retry(texts[mid:], max_retries)
             else:
-                print(f"\n   ❌ Embedding error: {e}")
-                return None
-    return None
+                log.warning(f"❌ Embedding error: {e}")
+                return [None]
+    return [None] * len(texts)
 
 def ingest_all_publications(batch_size=100):
     """Ingest ALL publications with REAL Gemini embeddings"""
-    df = pd.read_csv("data/publications.csv")
+    publications = read_publications()
     
-    print(f"🚀 Processing ALL {len(df)} publications with Gemini embeddings...")
+    print(f"🚀 Processing ALL {len(publications)} publications with Gemini embeddings...")
     print("⚠️  This will take longer than dummy embeddings but provides REAL semantic search!")
     print("   (Rate limited to ~100 requests/minute on free tier)")
     
     vectors = []
     processed = 0
-    skipped = 0
-    rate_limit_hits = 0
-    last_request_time = 0
+    next_request_time = 0
     
-    for i, row in tqdm(df.iterrows(), total=len(df), desc="Processing"):
-        title = str(row.get("Title", "")).strip()
-        link = str(row.get("Link", "")).strip()
-        
-        if not title or title == "nan":
-            skipped += 1
-            continue
-        
-        # Rate limiting - ensure we don't exceed 100 requests per minute
-        current_time = time.time()
-        time_since_last = current_time - last_request_time
-        if time_since_last < 0.65:  # ~92 requests per minute (leaving buffer)
-            time.sleep(0.65 - time_since_last)
-        
-        # Create unique ID for each publication
-        unique_id = f"publication-{i:04d}"
-        
-        # Create REAL embedding from title using Gemini
-        embedding = embed_with_retry(title)
-        last_request_time = time.time()
-        
-        if embedding is None:
-            skipped += 1
-            continue
+    rows_by_title, skipped = group_rows_by_title(enumerate(publications))
+    titles = list(rows_by_title)
+    
+    for start in tqdm(range(0, len(titles), EMBED_CHUNK_SIZE), desc="Embedding batches"):
+        chunk = titles[start:start + EMBED_CHUNK_SIZE]
         
-        metadata = {
-            "title": title,
-            "link": link,
-            "source": "nasa_publications",
-            "row_id": i,
-            "embedding_type": "gemini"  # Mark as real embedding
-        }
+        # Rate limiting - spend SECONDS_PER_TITLE of budget per title embedded
+        wait_time = next_request_time - time.time()
+        if wait_time > 0:
+            time.sleep(wait_time)
         
-        vectors.append((unique_id, embedding, metadata))
-        processed += 1
+        # Create REAL embeddings from titles using Gemini
+        embeddings = embed_with_retry(chunk)
+        next_request_time = time.time() + SECONDS_PER_TITLE * len(chunk)
         
-        # Upload in batches
-        if len(vectors) >= batch_size:
-            try:
-                index.upsert(vectors=vectors)
-                vectors = []
-            except Exception as e:
-                print(f"❌ Upload error: {e}")
+        for title, embedding in zip(chunk, embeddings):
+            if embedding is None:
+                skipped += len(rows_by_title[title])
+                continue
+            
+            for i, link in rows_by_title[title]:
+                # Create unique ID for each publication
+                unique_id = f"publication-{i:04d}"
+                
+                metadata = {
+                    "title": title,
+                    "link": link,
+                    "source": "nasa_publications",
+                    "row_id": i,
+                    "embedding_type": "gemini"  # Mark as real embedding
+                }
+                
+                vectors.append((unique_id, embedding, metadata))
+                processed += 1
+                
+                # Upload in batches
+                if len(vectors) >= batch_size:
+                    try:
+                        index.upsert(vectors=vectors)
+                        record_progress(vectors)
+                        vectors = []
+                    except Exception as e:
+                        log.warning(f"❌ Upload error: {e}")
     
     # Final upload
     if vectors:
         try:
             index.upsert(vectors=vectors)
+            record_progress(vectors)
         except Exception as e:
-            print(f"❌ Final upload error: {e}")
+            log.warning(f"❌ Final upload error: {e}")
     
     print(f"\n🎉 Ingestion Complete!")
     print(f"   ✅ Processed: {processed} publications")
@@ -149,10 +161,11 @@ def verify_ingestion():
         return 0
 
 if __name__ == "__main__":
+    configure_logging()
     print("🚀 CLEAN INGESTION WITH REAL GEMINI EMBEDDINGS")
     print("=" * 60)
     print("⚠️  This will use Gemini API credits!")
-    print("   Estimated: ~600 embedding calls (one per publication)")
+    print(f"   Estimated: ~{600 // EMBED_CHUNK_SIZE + 1} batched embedding calls for ~600 publications")
     print("   Time: ~8-10 minutes due to rate limiting (100 req/min)")
     print("=" * 60)
     
@@ -165,7 +178,8 @@ if __name__ == "__main__":
     clear_index()
     
     # Step 2: Ingest all publications with real embeddings
-    processed = ingest_all_publications()
+    with logging_redirect_tqdm():
+        processed = ingest_all_publications()
     
     # Step 3: Verify ingestion
     total_in_db = verify_ingestion()
@@ -0,0 +1,48 @@
+"""Helpers shared by the ingest scripts (ingest, ingest_fast, ingest_resume)."""
+import os
+import csv
+import logging
+
+PUBLICATIONS_PATH = "data/publications.csv"
+
+# Titles sent per embedding request
+EMBED_CHUNK_SIZE = 64
+
+# Warnings from inside the ingest loops go through logging (routed around the
+# tqdm bar with logging_redirect_tqdm) instead of print
+log = logging.getLogger("ingest")
+
+
+def configure_logging():
+    """Log level from LOG_LEVEL (default INFO); call from a script's __main__"""
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(levelname)s %(message)s")
+
+
+def read_publications(path=PUBLICATIONS_PATH):
+    """Read the publications CSV as a list of {column: value} dicts
+    
+    The file is opened as utf-8-sig because the exported CSV starts with a
+    byte-order mark, which would otherwise end up in the first column name.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+def group_rows_by_title(numbered_rows):
+    """Group (row index, CSV row) pairs by stripped title
+    
+    Titles are collected up front so they can be embedded in batches, and rows
+    sharing a title reuse one embedding. Returns ({title: [(i, link)]},
+    number of rows skipped for an empty title).
+    """
+    rows_by_title = {}
+    skipped = 0
+    for i, row in numbered_rows:
+        title = (row.get("Title") or "").strip()
+        link = (row.get("Link") or "").strip()
+        
+        if not title:
+            skipped += 1
+            continue
+        rows_by_title.setdefault(title, []).append((i, link))
+    return rows_by_title, skipped
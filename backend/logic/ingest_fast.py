@@ -1,84 +1,132 @@
 """Fast ingestion for paid API - no rate limiting."""
 import os
-import pandas as pd
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
 from dotenv import load_dotenv
 from pinecone import Pinecone
 
 load_dotenv()
 
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+# Enough pooled connections for every upload worker plus verify() queries
+PINECONE_POOL_SIZE = 32
+
+pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"), connection_pool_maxsize=PINECONE_POOL_SIZE)
 index = pc.Index("space-biology")
 
 from logic.utils import embed_texts
+from logic.ingest_progress import record_progress, reset_progress
+from logic.ingest_common import EMBED_CHUNK_SIZE, log, configure_logging, read_publications, group_rows_by_title
 
+# Embedding requests in flight at once
+EMBED_WORKERS = 16
+# Vectors per upsert request, and upserts in flight while embedding continues
+UPSERT_BATCH_SIZE = 100
+UPSERT_WORKERS = 4
+# Wait for outstanding upserts every this many batches to bound memory
+UPSERT_DRAIN_EVERY = 10
 
 def clear_index():
     """Clear the index to start fresh"""
     print("🧹 Clearing index...")
     try:
         index.delete(delete_all=True)
+        reset_progress()
         print("✅ Index cleared!")
     except Exception as e:
         print(f"⚠️  Could not clear index: {e}")
 
 
+def embed_chunk(titles, max_retries=5):
+    """Embed one chunk of titles, backing off on 429s"""
+    for attempt in range(max_retries):
+        try:
+            return embed_texts(titles)
+        except Exception as e:
+            error_str = str(e)
+            rate_limited = "429" in error_str or "RESOURCE_EXHAUSTED" in error_str
+            if not rate_limited or attempt == max_retries - 1:
+                raise
+            time.sleep(min(2 ** attempt, 30))
+
+
+def drain_uploads(pending):
+    """Wait for submitted upserts, reporting failures; returns vectors upserted"""
+    uploaded = 0
+    for future, batch in pending:
+        try:
+            future.result()
+            record_progress(batch)
+            uploaded += len(batch)
+        except Exception as e:
+            log.warning(f"❌ Upload error: {e}")
+    pending.clear()
+    return uploaded
+
+
 def ingest_all():
     """Ingest all publications at full speed (paid API)"""
-    df = pd.read_csv("data/publications.csv")
+    publications = read_publications()
     
-    print(f"🚀 Processing ALL {len(df)} publications with Gemini embeddings...")
+    print(f"🚀 Processing ALL {len(publications)} publications with Gemini embeddings...")
     print("   Paid API - no rate limiting!\n")
     
     vectors = []
+    pending = []  # (upsert future, vectors)
     processed = 0
-    skipped = 0
+    uploaded = 0
     
-    for i, row in tqdm(df.iterrows(), total=len(df), desc="Processing"):
-        title = str(row.get("Title", "")).strip()
-        link = str(row.get("Link", "")).strip()
-        
-        if not title or title == "nan":
-            skipped += 1
-            continue
-        
-        unique_id = f"publication-{i:04d}"
-        
-        try:
-            embedding = embed_texts([title])[0]
-        except Exception as e:
-            print(f"\n   ❌ Error at row {i}: {e}")
-            skipped += 1
-            continue
-        
-        metadata = {
-            "title": title,
-            "link": link,
-            "source": "nasa_publications",
-            "row_id": i,
-            "embedding_type": "gemini"
-        }
-        
-        vectors.append((unique_id, embedding, metadata))
-        processed += 1
-        
-        # Upload in batches of 100
-        if len(vectors) >= 100:
+    rows_by_title, skipped = group_rows_by_title(enumerate(publications))
+    titles = list(rows_by_title)
+    
+    chunks = [titles[start:start + EMBED_CHUNK_SIZE] for start in range(0, len(titles), EMBED_CHUNK_SIZE)]
+    
+    # Embedding is network-bound: keep EMBED_WORKERS requests in flight and
+    # hand each full batch to the upload pool so upserts overlap embedding
+    with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as executor, \
+            ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as uploader:
+        futures = {executor.submit(embed_chunk, chunk): chunk for chunk in chunks}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Embedding batches"):
+            chunk = futures[future]
             try:
-                index.upsert(vectors=vectors)
-                vectors = []
+                embeddings = future.result()
             except Exception as e:
-                print(f"\n❌ Upload error: {e}")
-    
-    # Final upload
-    if vectors:
-        try:
-            index.upsert(vectors=vectors)
-        except Exception as e:
-            print(f"\n❌ Final upload error: {e}")
+                chunk_rows = [i for title in chunk for i, _ in rows_by_title[title]]
+                log.warning(f"❌ Error at rows {min(chunk_rows)}-{max(chunk_rows)}: {e}")
+                skipped += len(chunk_rows)
+                continue
+            
+            for title, embedding in zip(chunk, embeddings):
+                for i, link in rows_by_title[title]:
+                    unique_id = f"publication-{i:04d}"
+                    
+                    metadata = {
+                        "title": title,
+                        "link": link,
+                        "source": "nasa_publications",
+                        "row_id": i,
+                        "embedding_type": "gemini"
+                    }
+                    
+                    vectors.append((unique_id, embedding, metadata))
+                    processed += 1
+                    
+                    # Upload in batches without waiting for the response
+                    if len(vectors) >= UPSERT_BATCH_SIZE:
+                        pending.append((uploader.submit(index.upsert, vectors=vectors), vectors))
+                        vectors = []
+                        if len(pending) >= UPSERT_DRAIN_EVERY:
+                            uploaded += drain_uploads(pending)
+        
+        # Final upload, then wait for everything still in flight
+        if vectors:
+            pending.append((uploader.submit(index.upsert, vectors=vectors), vectors))
+        uploaded += drain_uploads(pending)
     
     print(f"\n🎉 Ingestion Complete!")
     print(f"   ✅ Processed: {processed}")
+    print(f"   ☁️  Uploaded: {uploaded}")
     print(f"   ⚠️  Skipped: {skipped}")
     
     return processed
@@ -107,13 +155,15 @@ def verify():
 
 
 if __name__ == "__main__":
+    configure_logging()
     print("=" * 60)
     print("🚀 FULL SPEED INGESTION (PAID API)")
     print("=" * 60)
     
     # Clear and re-index everything
     clear_index()
-    processed = ingest_all()
+    with logging_redirect_tqdm():
+        processed = ingest_all()
     total = verify()
     
     print(f"\n{'='*60}")
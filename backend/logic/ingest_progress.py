@@ -0,0 +1,42 @@
+"""On-disk manifest of publications already upserted to Pinecone.
+
+The ingest scripts append one JSON line per vector after each successful
+upsert, so ingest_resume can skip finished rows exactly without querying
+the index.
+"""
+import os
+import time
+import orjson
+
+PROGRESS_PATH = "data/.ingest_progress.jsonl"
+
+
+def record_progress(vectors, path=PROGRESS_PATH):
+    """Append the (id, values, metadata) vectors of a successful upsert"""
+    now = time.time()
+    lines = b"".join(
+        orjson.dumps({"row_id": metadata["row_id"], "id": unique_id, "ts": now}) + b"\n"
+        for unique_id, _, metadata in vectors
+    )
+    with open(path, "ab") as f:
+        f.write(lines)
+
+
+def load_indexed_row_ids(path=PROGRESS_PATH):
+    """Row ids recorded in the manifest (empty if nothing was ingested yet)"""
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                done.add(int(orjson.loads(line)["row_id"]))
+            except (orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+                continue  # e.g. a line cut short by an interrupted run
+    return done
+
+
+def reset_progress(path=PROGRESS_PATH):
+    """Forget all recorded progress (after the index has been cleared)"""
+    if os.path.exists(path):
+        os.remove(path)
@@ -1,7 +1,7 @@
 """Resume ingestion from where it left off."""
 import os
-import pandas as pd
 from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
 from dotenv import load_dotenv
 from pinecone import Pinecone
 import time
@@ -12,106 +12,116 @@ pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 index = pc.Index("space-biology")
 
 from logic.utils import embed_texts
+from logic.ingest_progress import load_indexed_row_ids, record_progress
+from logic.ingest_common import EMBED_CHUNK_SIZE, log, configure_logging, read_publications, group_rows_by_title
 
-
-def get_existing_ids():
-    """Get list of already indexed publication IDs"""
-    try:
-        # Query with a dummy vector to get IDs
-        stats = index.describe_index_stats()
-        if stats.total_vector_count == 0:
-            return set()
-        
-        # Fetch all IDs using query
-        existing_ids = set()
-        # We'll track by row_id in metadata instead
-        return existing_ids
-    except:
-        return set()
+# Seconds of rate-limit budget per embedded title
+SECONDS_PER_TITLE = 0.65
+# Vector ids looked up per fetch when seeding progress from the index
+PROBE_BATCH_SIZE = 100
 
 
-def get_indexed_row_ids():
-    """Get row_ids of already indexed publications"""
-    try:
-        # Query a sample to check metadata
-        sample = index.query(
-            vector=[0.1] * 1024,
-            top_k=100,
-            include_metadata=True
-        )
-        indexed_rows = set()
-        for match in sample['matches']:
-            if 'row_id' in match['metadata']:
-                indexed_rows.add(match['metadata']['row_id'])
-        return indexed_rows
-    except:
-        return set()
+def seed_indexed_row_ids(total):
+    """Row ids already in the index, found by fetching their vector ids
+    
+    For indexes ingested before the progress manifest existed. The rows found
+    are written to the manifest so later runs don't probe again.
+    """
+    done = set()
+    for start in range(0, total, PROBE_BATCH_SIZE):
+        ids = [f"publication-{i:04d}" for i in range(start, min(start + PROBE_BATCH_SIZE, total))]
+        found = [
+            (unique_id, None, {"row_id": int(unique_id.rsplit("-", 1)[1])})
+            for unique_id in index.fetch(ids=ids).vectors
+        ]
+        if found:
+            record_progress(found)
+            done.update(metadata["row_id"] for _, _, metadata in found)
+    return done
 
 
-def ingest_remaining(start_from=400):
-    """Ingest publications starting from a specific row"""
-    df = pd.read_csv("data/publications.csv")
+def ingest_remaining(start_from=0):
+    """Ingest publications not yet recorded in the progress manifest
+    
+    Rows before start_from are skipped as well.
+    """
+    publications = read_publications()
+    total = len(publications)
+    done = load_indexed_row_ids()
+    if not done:
+        log.warning("⚠️  Progress manifest is missing or empty; checking the index for rows already ingested")
+        try:
+            done = seed_indexed_row_ids(total)
+        except Exception as e:
+            # Same approximation the script used before the manifest: rows are
+            # ingested in order, so skip as many rows as there are vectors
+            indexed = index.describe_index_stats().total_vector_count
+            log.warning(f"⚠️  Could not probe the index ({e}); resuming after its {indexed} vectors")
+            start_from = max(start_from, indexed)
     
-    total = len(df)
-    remaining = total - start_from
+    remaining = sum(1 for i in range(start_from, total) if i not in done)
     
-    print(f"🚀 Resuming ingestion from row {start_from}")
+    print(f"🚀 Resuming ingestion from row {start_from} ({len(done)} rows already indexed)")
     print(f"   Total: {total}, Remaining: {remaining}")
     
     vectors = []
     processed = 0
-    skipped = 0
     
-    for i in tqdm(range(start_from, total), desc="Processing"):
-        row = df.iloc[i]
-        title = str(row.get("Title", "")).strip()
-        link = str(row.get("Link", "")).strip()
-        
-        if not title or title == "nan":
-            skipped += 1
-            continue
-        
-        # Rate limiting
-        time.sleep(0.65)
+    rows_by_title, skipped = group_rows_by_title(
+        (i, row) for i, row in enumerate(publications[start_from:], start=start_from)
+        if i not in done
+    )
+    titles = list(rows_by_title)
+    
+    for start in tqdm(range(0, len(titles), EMBED_CHUNK_SIZE), desc="Embedding batches"):
+        chunk = titles[start:start + EMBED_CHUNK_SIZE]
+        chunk_rows = [i for title in chunk for i, _ in rows_by_title[title]]
         
-        unique_id = f"publication-{i:04d}"
+        # Rate limiting (same per-title budget as before, spent per batch)
+        time.sleep(SECONDS_PER_TITLE * len(chunk))
         
         try:
-            embedding = embed_texts([title])[0]
+            embeddings = embed_texts(chunk)
         except Exception as e:
             if "429" in str(e):
-                print(f"\n⏳ Rate limited at row {i}. Stopping here.")
-                print(f"   Run again later to resume from row {i}")
+                log.warning(f"⏳ Rate limited at row {min(chunk_rows)}. Stopping here; "
+                            "run again later to pick up the remaining rows")
                 break
-            print(f"\n   ❌ Error at row {i}: {e}")
-            skipped += 1
+            log.warning(f"❌ Error at rows {min(chunk_rows)}-{max(chunk_rows)}: {e}")
+            skipped += len(chunk_rows)
             continue
         
-        metadata = {
-            "title": title,
-            "link": link,
-            "source": "nasa_publications",
-            "row_id": i,
-            "embedding_type": "gemini"
-        }
-        
-        vectors.append((unique_id, embedding, metadata))
-        processed += 1
-        
-        # Upload in batches
-        if len(vectors) >= 50:
-            try:
-                index.upsert(vectors=vectors)
-                vectors = []
-            except Exception as e:
-                print(f"❌ Upload error: {e}")
+        for title, embedding in zip(chunk, embeddings):
+            for i, link in rows_by_title[title]:
+                unique_id = f"publication-{i:04d}"
+                
+                metadata = {
+                    "title": title,
+                    "link": link,
+                    "source": "nasa_publications",
+                    "row_id": i,
+                    "embedding_type": "gemini"
+                }
+                
+                vectors.append((unique_id, embedding, metadata))
+                processed += 1
+                
+                # Upload in batches
+                if len(vectors) >= 50:
+                    try:
+                        index.upsert(vectors=vectors)
+                        record_progress(vectors)
+                        vectors = []
+                    except Exception as e:
+                        log.warning(f"❌ Upload error: {e}")
     
     # Final upload
     if vectors:
         try:
             index.upsert(vectors=vectors)
+            record_progress(vectors)
         except Exception as e:
-            print(f"❌ Final upload error: {e}")
+            log.warning(f"❌ Final upload error: {e}")
     
     print(f"\n🎉 Progress: {processed} more publications indexed")
     print(f"   Skipped: {skipped}")
@@ -127,8 +137,9 @@ def verify():
 
 
 if __name__ == "__main__":
+    configure_logging()
     print("=" * 60)
-    print("🚀 RESUME INGESTION (starting from row 400)")
+    print("🚀 RESUME INGESTION (skipping rows in the progress manifest)")
     print("=" * 60)
     
     current = verify()
@@ -137,12 +148,13 @@ if __name__ == "__main__":
         print("✅ All publications already indexed!")
         exit()
     
-    confirm = input(f"\nContinue from row {current}? (yes/no): ")
+    confirm = input(f"\nIndex the remaining publications? (yes/no): ")
     if confirm.lower() != "yes":
         print("Aborted.")
         exit()
     
-    ingest_remaining(start_from=current)
+    with logging_redirect_tqdm():
+        ingest_remaining()
     final = verify()
     
     print(f"\n{'='*60}")
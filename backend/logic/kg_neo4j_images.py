@@ -1,18 +1,40 @@
 import os
+import re
 import base64
+import binascii
 import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Dedup fingerprints only need collision resistance, not cryptographic strength
+try:
+    import xxhash
+except ImportError:
+    print("⚠️  Warning: xxhash not installed. Falling back to BLAKE2b fingerprints.")
+    xxhash = None
+
 try:
     from neo4j import GraphDatabase
+    from neo4j.exceptions import ServiceUnavailable
     NEO4J_URI=os.getenv("NEO4J_URI","bolt://localhost:7687")
     NEO4J_USER=os.getenv("NEO4J_USER","neo4j")
     NEO4J_PASSWORD=os.getenv("NEO4J_PASSWORD")
+    # Pool tuning; size the pool for the number of concurrent sessions
+    NEO4J_POOL_SIZE=int(os.getenv("NEO4J_POOL_SIZE", "64"))
+    NEO4J_ACQUISITION_TIMEOUT=float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))
+    NEO4J_KEEP_ALIVE=os.getenv("NEO4J_KEEP_ALIVE", "true").lower() != "false"
     if not NEO4J_PASSWORD:
         raise RuntimeError("NEO4J_PASSWORD environment variable must be set!")
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    driver = GraphDatabase.driver(
+        NEO4J_URI,
+        auth=(NEO4J_USER, NEO4J_PASSWORD),
+        max_connection_pool_size=NEO4J_POOL_SIZE,
+        connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT,
+        keep_alive=NEO4J_KEEP_ALIVE
+    )
     
     NEO4J_AVAILABLE = True
 except ImportError:
@@ -24,88 +46,297 @@ except Exception as e:
     NEO4J_AVAILABLE = False
     driver = None
 
+# Publications per UNWIND write (large enough to amortize round-trips,
+# small enough to keep one transaction's memory bounded)
+NEO4J_BATCH_SIZE = 1000
+# Publications per shard and parallel writer sessions when building the graph
+NEO4J_SHARD_SIZE = 200
+NEO4J_WORKERS = int(os.getenv("NEO4J_WORKERS", "8"))
+# Bytes read per step when encoding image files (a multiple of 3)
+IMAGE_READ_CHUNK = 57 * 1024
+# Image bytes live on disk keyed by hash; Neo4j only keeps a uri pointing here
+IMAGE_BLOB_DIR = os.getenv("IMAGE_BLOB_DIR", "data/blobs")
+
+def get_driver():
+    """Process-wide Neo4j driver (None if Neo4j is unavailable)
+    
+    The driver is thread-safe and owns the connection pool; sessions are not.
+    Open one short-lived driver.session() per unit of work (request, batch,
+    worker thread) and run concurrent work in separate sessions rather than
+    sharing one.
+    """
+    return driver
+
+def close_driver():
+    """Close the driver's pooled connections (call on shutdown)"""
+    if driver is not None:
+        driver.close()
+
+# Uniqueness constraints back every MERGE key with an index, so MERGE is an
+# index probe instead of a label scan; the full-text index serves publication
+# search. pub_title (an older CONTAINS index) is dropped where it still exists.
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT pub_id IF NOT EXISTS FOR (p:Publication) REQUIRE p.id IS UNIQUE",
+    "CREATE CONSTRAINT img_hash IF NOT EXISTS FOR (i:Image) REQUIRE i.hash IS UNIQUE",
+    "CREATE CONSTRAINT ent_name IF NOT EXISTS FOR (e:Entity) REQUIRE e.name IS UNIQUE",
+    "CREATE CONSTRAINT find_hash IF NOT EXISTS FOR (f:Finding) REQUIRE f.hash IS UNIQUE",
+    "DROP INDEX pub_title IF EXISTS",
+    "CREATE FULLTEXT INDEX pub_fulltext IF NOT EXISTS FOR (p:Publication) ON EACH [p.title, p.abstract]",
+]
+
+# Characters with a meaning in Lucene query syntax (escaped in user search terms)
+LUCENE_SPECIAL_RE = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+def ensure_schema():
+    """Create the graph's constraints and indexes if missing (idempotent)
+    
+    Call once at startup, before any bulk ingest. A statement that fails (e.g.
+    existing duplicate nodes block a constraint) is reported and skipped.
+    """
+    if not NEO4J_AVAILABLE:
+        return False
+    
+    ok = True
+    with driver.session() as session:
+        for statement in SCHEMA_STATEMENTS:
+            try:
+                session.run(statement).consume()
+            except ServiceUnavailable as e:
+                print(f"⚠️  Warning: Neo4j unreachable, schema not applied: {e}")
+                return False
+            except Exception as e:
+                ok = False
+                print(f"⚠️  Warning: Could not apply Neo4j schema ({statement}): {e}")
+    return ok
+
+def stream_b64(image_path, hasher=None, chunk_size=IMAGE_READ_CHUNK):
+    """Base64-encode a file chunk by chunk, feeding the raw bytes to hasher
+    
+    Only one chunk of raw bytes is held at a time instead of the whole file
+    alongside its encoding. chunk_size must be a multiple of 3 so the chunks'
+    encodings concatenate without padding in between.
+    """
+    parts = []
+    with open(image_path, "rb") as image_file:
+        while chunk := image_file.read(chunk_size):
+            if hasher is not None:
+                hasher.update(chunk)
+            parts.append(base64.b64encode(chunk).decode('ascii'))
+    return "".join(parts)
+
 def encode_image_to_base64(image_path):
     """Convert image file to base64 string for storage"""
     try:
-        with open(image_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-            return encoded_string
+        return stream_b64(image_path)
     except Exception as e:
         print(f"Error encoding image: {e}")
         return None
 
+def _blob_path(img_hash):
+    return os.path.join(IMAGE_BLOB_DIR, img_hash[:2], f"{img_hash}.bin")
+
+def _blob_uri(img_hash):
+    return f"file://{os.path.abspath(_blob_path(img_hash))}"
+
+def _write_blob(chunks, img_hash=None):
+    """Write byte chunks to blob storage; returns (hash, uri)
+    
+    The hash is computed while writing unless given. Data goes to a temp file
+    that is renamed into place, so readers never see a partial blob and
+    concurrent writers of the same image simply replace identical content.
+    """
+    os.makedirs(IMAGE_BLOB_DIR, exist_ok=True)
+    hasher = _fingerprint_hasher() if img_hash is None else None
+    fd, tmp_path = tempfile.mkstemp(dir=IMAGE_BLOB_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as blob:
+            for chunk in chunks:
+                if hasher is not None:
+                    hasher.update(chunk)
+                blob.write(chunk)
+        if hasher is not None:
+            img_hash = hasher.hexdigest()
+        path = _blob_path(img_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return img_hash, _blob_uri(img_hash)
+
+def store_image_blob(img_hash, raw):
+    """Store raw image bytes under their hash unless already present; returns the uri"""
+    if os.path.exists(_blob_path(img_hash)):
+        return _blob_uri(img_hash)
+    return _write_blob([raw], img_hash)[1]
+
+def store_image_file(image_path):
+    """Copy an image file into blob storage, hashing it in the same pass
+    
+    Returns (hash, uri), or None if the file can't be read or is empty.
+    """
+    try:
+        if not os.path.getsize(image_path):
+            return None
+        with open(image_path, "rb") as image_file:
+            return _write_blob(iter(lambda: image_file.read(IMAGE_READ_CHUNK), b""))
+    except Exception as e:
+        print(f"Error storing image: {e}")
+        return None
+
+def get_image_bytes(img_hash):
+    """Raw bytes of a stored image, or None if its blob is missing"""
+    try:
+        with open(_blob_path(img_hash), "rb") as blob:
+            return blob.read()
+    except FileNotFoundError:
+        return None
+
+def _fingerprint_hasher():
+    """Incremental hasher behind fingerprint() (xxHash128, BLAKE2b without xxhash)"""
+    if xxhash is not None:
+        return xxhash.xxh128()
+    return hashlib.blake2b(digest_size=16)
+
+def fingerprint(data):
+    """128-bit hex fingerprint of str/bytes"""
+    if isinstance(data, str):
+        data = data.encode()
+    hasher = _fingerprint_hasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
 def create_image_hash(image_data):
-    """Create unique hash for image deduplication using SHA-256"""
-    return hashlib.sha256(image_data.encode()).hexdigest()[:32]  # Use first 32 chars for shorter hash
+    """Create unique hash for image deduplication (str or bytes)"""
+    return fingerprint(image_data)
+
+def _image_pointer(img):
+    """(hash, uri) of an image dict, storing its base64 data as a blob if needed
+    
+    Returns None if the image has no valid base64 data to store.
+    """
+    if img.get('hash') and img.get('uri'):
+        return img['hash'], img['uri']
+    try:
+        raw = base64.b64decode(img.get('data') or '', validate=True)
+    except (binascii.Error, ValueError, TypeError) as e:
+        print(f"⚠️  Warning: Skipping image {img.get('filename')}: invalid base64 data ({e})")
+        return None
+    if not raw:
+        return None
+    img_hash = img.get('hash') or create_image_hash(raw)
+    return img_hash, store_image_blob(img_hash, raw)
+
+def _image_rows(images, default_type):
+    """Image dicts as UNWIND parameters: hash and blob uri instead of the bytes"""
+    rows = []
+    for img in images or []:
+        pointer = _image_pointer(img)
+        if pointer is None:
+            continue
+        img_hash, uri = pointer
+        rows.append({
+            'hash': img_hash,
+            'filename': img['filename'],
+            'uri': uri,
+            'type': img.get('type', default_type)
+        })
+    return rows
+
+def _with_image_data(images):
+    """Fill in base64 'data' from blob storage for images stored as pointers"""
+    for img in images:
+        if img.get('data') is None and img.get('hash'):
+            raw = get_image_bytes(img['hash'])
+            img['data'] = base64.b64encode(raw).decode('utf-8') if raw is not None else None
+    return images
 
 def add_publication_with_images(tx, pub_id, title, abstract, images=None):
-    """Add publication node with associated images"""
-    # Create publication node
+    """Add publication node with associated images (one query for all images)"""
     tx.run("""
         MERGE (p:Publication {id: $pub_id})
         SET p.title = $title, p.abstract = $abstract, p.created_at = datetime()
-        """, pub_id=pub_id, title=title, abstract=abstract)
+        WITH p
+        UNWIND $images AS img
+        MERGE (i:Image {hash: img.hash})
+        SET i.filename = img.filename,
+            i.uri = img.uri,
+            i.type = img.type,
+            i.created_at = datetime()
+        MERGE (p)-[:HAS_IMAGE]->(i)
+        """, pub_id=pub_id, title=title, abstract=abstract,
+             images=_image_rows(images, 'unknown'))
+
+def _publication_entities(pubs):
+    """Set of entity names extracted from the publications' titles and abstracts"""
+    entities = set()
+    for pub in pubs:
+        entities.update(extract_entities_from_text(pub.get('title', '') + ' ' + pub.get('abstract', '')))
+    return entities
+
+def add_publications_batch(tx, pubs, entities=None):
+    """Add many publications, their images and extracted entities in two queries
+    
+    pubs are dicts with id, title, abstract and optional images. Entities are
+    MERGEd as biological_entity nodes, as add_entity_with_image does; pass
+    entities to use those names instead of extracting them from pubs.
+    """
+    rows = [{
+        'id': pub['id'],
+        'title': pub['title'],
+        'abstract': pub.get('abstract', ''),
+        'images': _image_rows(pub.get('images'), 'unknown')
+    } for pub in pubs]
+    if entities is None:
+        entities = _publication_entities(pubs)
     
-    # Add images if provided
-    if images:
-        for img in images:
-            img_hash = create_image_hash(img['data'])
-            tx.run("""
-                MERGE (i:Image {hash: $hash})
-                SET i.filename = $filename, 
-                    i.data = $data, 
-                    i.type = $img_type,
-                    i.created_at = datetime()
-                """, hash=img_hash, filename=img['filename'], 
-                     data=img['data'], img_type=img.get('type', 'unknown'))
-            
-            # Link publication to image
-            tx.run("""
-                MATCH (p:Publication {id: $pub_id})
-                MATCH (i:Image {hash: $hash})
-                MERGE (p)-[:HAS_IMAGE]->(i)
-                """, pub_id=pub_id, hash=img_hash)
+    tx.run("""
+        UNWIND $pubs AS pub
+        MERGE (p:Publication {id: pub.id})
+        SET p.title = pub.title, p.abstract = pub.abstract, p.created_at = datetime()
+        WITH p, pub
+        UNWIND pub.images AS img
+        MERGE (i:Image {hash: img.hash})
+        SET i.filename = img.filename,
+            i.uri = img.uri,
+            i.type = img.type,
+            i.created_at = datetime()
+        MERGE (p)-[:HAS_IMAGE]->(i)
+        """, pubs=rows)
+    tx.run("""
+        UNWIND $names AS name
+        MERGE (e:Entity {name: name})
+        SET e.type = 'biological_entity', e.created_at = datetime()
+        """, names=list(entities))
 
 def add_entity_with_image(tx, entity_name, entity_type, image_data=None):
     """Add entity (like protein, cell, organism) with associated image"""
-    # Create entity node
     tx.run("""
         MERGE (e:Entity {name: $name})
         SET e.type = $type, e.created_at = datetime()
-        """, name=entity_name, type=entity_type)
-    
-    if image_data:
-        img_hash = create_image_hash(image_data['data'])
-        tx.run("""
-            MERGE (i:Image {hash: $hash})
-            SET i.filename = $filename, 
-                i.data = $data, 
-                i.type = $img_type,
-                i.created_at = datetime()
-            """, hash=img_hash, filename=image_data['filename'], 
-                 data=image_data['data'], img_type=image_data.get('type', 'entity'))
-        
-        # Link entity to image
-        tx.run("""
-            MATCH (e:Entity {name: $name})
-            MATCH (i:Image {hash: $hash})
-            MERGE (e)-[:REPRESENTED_BY]->(i)
-            """, name=entity_name, hash=img_hash)
+        WITH e
+        UNWIND $images AS img
+        MERGE (i:Image {hash: img.hash})
+        SET i.filename = img.filename,
+            i.uri = img.uri,
+            i.type = img.type,
+            i.created_at = datetime()
+        MERGE (e)-[:REPRESENTED_BY]->(i)
+        """, name=entity_name, type=entity_type,
+             images=_image_rows([image_data] if image_data else [], 'entity'))
 
 def add_research_finding(tx, finding_text, publication_id, confidence=0.5):
-    """Add research finding extracted from text"""
-    finding_hash = hashlib.sha256(finding_text.encode()).hexdigest()[:32]
+    """Add research finding extracted from text and link it to its publication"""
+    finding_hash = fingerprint(finding_text)
     tx.run("""
         MERGE (f:Finding {hash: $hash})
         SET f.text = $text, f.confidence = $confidence, f.created_at = datetime()
-        """, hash=finding_hash, text=finding_text, confidence=confidence)
-    
-    # Link to publication
-    tx.run("""
+        WITH f
         MATCH (p:Publication {id: $pub_id})
-        MATCH (f:Finding {hash: $hash})
         MERGE (p)-[:CONTAINS_FINDING]->(f)
-        """, pub_id=publication_id, hash=finding_hash)
+        """, hash=finding_hash, text=finding_text, confidence=confidence,
+             pub_id=publication_id)
 
 def link_entities_to_findings(tx, entity_name, finding_hash, relationship="MENTIONED_IN"):
     """Link entities to research findings"""
@@ -115,44 +346,80 @@ def link_entities_to_findings(tx, entity_name, finding_hash, relationship="MENTI
         MERGE (e)-[r:RELATION {type: $rel_type}]->(f)
         """, entity_name=entity_name, finding_hash=finding_hash, rel_type=relationship)
 
-def get_images_for_publication(tx, pub_id):
-    """Retrieve all images for a publication"""
+def merge_publications_metadata(tx, rows):
+    """Upsert publication nodes from Pinecone metadata in one UNWIND query"""
+    tx.run("""
+        UNWIND $rows AS row
+        MERGE (p:Publication {id: row.id})
+        SET p.title = row.title,
+            p.abstract = row.abstract,
+            p.link = row.link,
+            p.source = row.source,
+            p.indexed_at = datetime()
+        """, rows=rows)
+
+def get_images_for_publication(tx, pub_id, include_data=True):
+    """Retrieve all images for a publication
+    
+    With include_data, images stored as blob pointers get their base64 'data'
+    loaded from disk so callers see the same shape as before.
+    """
     result = tx.run("""
         MATCH (p:Publication {id: $pub_id})-[:HAS_IMAGE]->(i:Image)
-        RETURN i.filename as filename, i.data as data, i.type as type, i.hash as hash
+        RETURN i.filename as filename, i.data as data, i.type as type, i.hash as hash, i.uri as uri
         """, pub_id=pub_id)
-    return [record.data() for record in result]
+    images = [record.data() for record in result]
+    return _with_image_data(images) if include_data else images
 
-def get_entity_with_images(tx, entity_name):
-    """Get entity and its associated images"""
+def get_entity_with_images(tx, entity_name, include_data=True):
+    """Get entity and its associated images (None if the entity doesn't exist)
+    
+    As in get_images_for_publication, include_data loads the base64 'data' of
+    images stored as blob pointers.
+    """
     result = tx.run("""
         MATCH (e:Entity {name: $name})
         OPTIONAL MATCH (e)-[:REPRESENTED_BY]->(i:Image)
         RETURN e.name as entity_name, e.type as entity_type,
-               collect({filename: i.filename, data: i.data, type: i.type}) as images
+               collect({filename: i.filename, data: i.data, type: i.type, hash: i.hash, uri: i.uri}) as images
         """, name=entity_name)
-    return result.single()
+    record = result.single()
+    if record is None:
+        return None
+    entity = record.data()
+    # OPTIONAL MATCH yields one all-null image for an entity without images
+    images = [img for img in entity['images'] if img.get('hash')]
+    entity['images'] = _with_image_data(images) if include_data else images
+    return entity
 
 def search_publications_with_images(tx, search_term, limit=10):
-    """Search publications and return those with images"""
+    """Search publications (full-text over title and abstract) with their images
+    
+    Uses the pub_fulltext index created by ensure_schema(); results are ranked
+    by relevance score. The term is escaped and lowercased (so AND/OR/NOT
+    aren't operators), so it is matched as whole words rather than as a
+    substring of the title. An empty term returns no results.
+    """
+    query = LUCENE_SPECIAL_RE.sub(r"\\\1", search_term.strip().lower())
+    if not query:
+        return []
     result = tx.run("""
-        MATCH (p:Publication)
-        WHERE p.title CONTAINS $search_term OR p.abstract CONTAINS $search_term
+        CALL db.index.fulltext.queryNodes("pub_fulltext", $query) YIELD node AS p, score
         OPTIONAL MATCH (p)-[:HAS_IMAGE]->(i:Image)
-        RETURN p.id as pub_id, p.title as title, 
+        RETURN p.id as pub_id, p.title as title, score,
                collect({filename: i.filename, hash: i.hash, type: i.type}) as images
+        ORDER BY score DESC
         LIMIT $limit
-        """, search_term=search_term, limit=limit)
+        """, query=query, limit=limit)
     return [record.data() for record in result]
 
 def get_knowledge_graph_stats(tx):
-    """Get statistics about the knowledge graph"""
+    """Get statistics about the knowledge graph (label counts from the count store)"""
     result = tx.run("""
-        MATCH (p:Publication) WITH count(p) as pub_count
-        MATCH (e:Entity) WITH pub_count, count(e) as entity_count
-        MATCH (i:Image) WITH pub_count, entity_count, count(i) as image_count
-        MATCH (f:Finding) WITH pub_count, entity_count, image_count, count(f) as finding_count
-        RETURN pub_count, entity_count, image_count, finding_count
+        RETURN count { (:Publication) } as pub_count,
+               count { (:Entity) } as entity_count,
+               count { (:Image) } as image_count,
+               count { (:Finding) } as finding_count
         """)
     return result.single().data()
 
@@ -166,16 +433,18 @@ def save_publication_with_images(pub_id, title, abstract, image_files=None):
         images = []
         if image_files:
             for img_file in image_files:
-                img_data = encode_image_to_base64(img_file['path'])
-                if img_data:
+                stored = store_image_file(img_file['path'])
+                if stored:
+                    img_hash, uri = stored
                     images.append({
                         'filename': img_file['filename'],
-                        'data': img_data,
+                        'hash': img_hash,
+                        'uri': uri,
                         'type': img_file.get('type', 'publication_image')
                     })
         
         with driver.session() as session:
-            session.write_transaction(
+            session.execute_write(
                 add_publication_with_images, 
                 pub_id, title, abstract, images
             )
@@ -184,58 +453,109 @@ def save_publication_with_images(pub_id, title, abstract, image_files=None):
     except Exception as e:
         return {"error": str(e)}
 
-def create_knowledge_graph_from_publications(publications_data):
-    """Process publications and create knowledge graph with images"""
+def _write_publication_shard(start, shard, entities):
+    """Write one shard in its own session (sessions aren't thread-safe)
+    
+    If the shard's transaction fails, its publications are retried one per
+    transaction so the good rows still land. Returns [(row, pub_id, error)]
+    for the rows that failed on their own.
+    """
+    with driver.session() as session:
+        try:
+            session.execute_write(add_publications_batch, shard, entities)
+            return []
+        except Exception as e:
+            print(f"⚠️  Warning: Publications {start}-{start + len(shard) - 1} failed as a batch ({e}); retrying one by one")
+        failed = []
+        for row, pub in enumerate(shard, start=start):
+            try:
+                session.execute_write(add_publications_batch, [pub])
+            except Exception as e:
+                print(f"❌ Error writing publication {row} ({pub.get('id')}): {e}")
+                failed.append((row, pub.get('id'), e))
+        return failed
+
+def create_knowledge_graph_from_publications(publications_data, batch_size=NEO4J_SHARD_SIZE,
+                                             workers=NEO4J_WORKERS):
+    """Process publications and create knowledge graph with images
+    
+    Publications are split into shards of batch_size (capped at
+    NEO4J_BATCH_SIZE), each written with UNWIND queries in one transaction.
+    Up to `workers` shards are written concurrently; a shard that fails is
+    retried row by row, and errors name the publications that still failed.
+    
+    Repeated publication ids (e.g. from combined feeds) are written once, for
+    their first occurrence, and each entity is MERGEd by only one shard so
+    shards don't contend for the same entity nodes.
+    """
     if not NEO4J_AVAILABLE:
         return {"error": "Neo4j not available"}
     
+    seen_pubs = set()
+    unique_pubs = []
+    duplicates = 0
+    for pub in publications_data:
+        if pub['id'] in seen_pubs:
+            duplicates += 1
+            continue
+        seen_pubs.add(pub['id'])
+        unique_pubs.append(pub)
+    publications_data = unique_pubs
+    batch_size = min(batch_size, NEO4J_BATCH_SIZE)
+    ensure_schema()
     processed = 0
     errors = []
     
+    seen_entities = set()
+    shards = []
+    for start in range(0, len(publications_data), batch_size):
+        shard = publications_data[start:start + batch_size]
+        entities = _publication_entities(shard) - seen_entities
+        seen_entities |= entities
+        shards.append((start, shard, entities))
+    
     try:
-        with driver.session() as session:
-            for pub in publications_data:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_write_publication_shard, start, shard, list(entities)): start
+                for start, shard, entities in shards
+            }
+            for future in as_completed(futures):
+                start = futures[future]
+                end = min(start + batch_size, len(publications_data))
                 try:
-                    # Extract entities from title/abstract (basic approach)
-                    entities = extract_entities_from_text(pub.get('title', '') + ' ' + pub.get('abstract', ''))
-                    
-                    # Save publication
-                    session.write_transaction(
-                        add_publication_with_images,
-                        pub['id'], pub['title'], pub.get('abstract', ''),
-                        pub.get('images', [])
-                    )
-                    
-                    # Save entities
-                    for entity in entities:
-                        session.write_transaction(
-                            add_entity_with_image,
-                            entity, "biological_entity"
-                        )
-                    
-                    processed += 1
+                    failed = future.result()
                 except Exception as e:
-                    errors.append(f"Error processing {pub.get('id', 'unknown')}: {str(e)}")
+                    errors.append(f"Error processing publications {start}-{end - 1}: {str(e)}")
+                    continue
+                processed += end - start - len(failed)
+                errors.extend(
+                    f"Error processing publication {row} ({pub_id}): {str(e)}"
+                    for row, pub_id, e in failed
+                )
         
         return {
             "processed": processed,
+            "duplicates_skipped": duplicates,
             "errors": errors,
             "success": len(errors) == 0
         }
     except Exception as e:
         return {"error": str(e)}
 
+ENTITY_STOPWORDS = frozenset({'and', 'the', 'for', 'with', 'from', 'effects', 'study', 'analysis'})
+ENTITY_STRIP_CHARS = '.,()[]'
+
 def extract_entities_from_text(text):
     """Basic entity extraction (capitalized words > 3 chars)"""
-    words = text.split()
-    entities = []
-    for word in words:
-        clean_word = word.strip('.,()[]').strip()
+    entities = set()
+    for word in text.split():
+        clean_word = word.strip(ENTITY_STRIP_CHARS)
         if (len(clean_word) > 3 and 
             clean_word[0].isupper() and 
-            clean_word.lower() not in ['and', 'the', 'for', 'with', 'from', 'effects', 'study', 'analysis']):
-            entities.append(clean_word)
-    return list(set(entities))
+            clean_word.lower() not in ENTITY_STOPWORDS):
+            entities.add(clean_word)
+    return list(entities)
 
 # Test function
 def test_neo4j_connection():
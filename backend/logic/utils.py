@@ -1,23 +1,52 @@
 """Embedding utilities using Gemini API."""
 import os
+from functools import lru_cache
+import httpx
 from dotenv import load_dotenv
 from google import genai
+from google.genai import types
 
 load_dotenv()
 
+# HTTP/2 lets concurrent requests share one connection; httpx needs the h2
+# package for it (pip install "httpx[http2]")
+try:
+    import h2  # noqa: F401
+    GEMINI_HTTP2 = True
+except ImportError:
+    GEMINI_HTTP2 = False
+
+# Keep-alive pool shared by every Gemini request from this process, so /search
+# and /qa reuse warm TLS connections instead of handshaking under load
+GEMINI_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+GEMINI_HTTP_OPTIONS = types.HttpOptions(
+    client_args={"limits": GEMINI_HTTP_LIMITS, "http2": GEMINI_HTTP2},
+    async_client_args={"limits": GEMINI_HTTP_LIMITS, "http2": GEMINI_HTTP2},
+)
+
 # Initialize Gemini client
 try:
-    gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    gemini_client = genai.Client(
+        api_key=os.getenv("GEMINI_API_KEY"),
+        http_options=GEMINI_HTTP_OPTIONS,
+    )
     print("✅ Gemini client initialized successfully")
 except Exception as e:
     gemini_client = None
     print(f"⚠️  Warning: Gemini client initialization failed: {e}")
 
 
+# Max contents per batchEmbedContents request
+EMBED_BATCH_SIZE = 100
+
+
 def embed_texts(texts, target_dim=1024):
     """
     Generate embeddings using Gemini API and truncate to target dimension.
     
+    Texts are sent in batches of EMBED_BATCH_SIZE per request rather than
+    one request per text.
+    
     Args:
         texts: List of strings to embed
         target_dim: Target dimension (default 1024 to match Pinecone index)
@@ -28,18 +57,45 @@ def embed_texts(texts, target_dim=1024):
     if gemini_client is None:
         raise RuntimeError("Gemini client not initialized. Check GEMINI_API_KEY.")
     
+    # Truncate text if too long (Gemini has token limits)
+    truncated_texts = [text[:8000] for text in texts]
+    
     embeddings = []
-    for text in texts:
-        # Truncate text if too long (Gemini has token limits)
-        truncated_text = text[:8000] if len(text) > 8000 else text
-        
+    for start in range(0, len(truncated_texts), EMBED_BATCH_SIZE):
         result = gemini_client.models.embed_content(
             model="models/gemini-embedding-001",
-            contents=truncated_text
+            contents=truncated_texts[start:start + EMBED_BATCH_SIZE]
         )
         
         # Extract embedding values and truncate to target dimension
-        embedding = result.embeddings[0].values[:target_dim]
-        embeddings.append(embedding)
+        embeddings.extend(e.values[:target_dim] for e in result.embeddings)
     
     return embeddings
+
+
+async def aembed_texts(texts, target_dim=1024):
+    """Async embed_texts using the client's aio interface (same batching/output)."""
+    if gemini_client is None:
+        raise RuntimeError("Gemini client not initialized. Check GEMINI_API_KEY.")
+    
+    truncated_texts = [text[:8000] for text in texts]
+    
+    embeddings = []
+    for start in range(0, len(truncated_texts), EMBED_BATCH_SIZE):
+        result = await gemini_client.aio.models.embed_content(
+            model="models/gemini-embedding-001",
+            contents=truncated_texts[start:start + EMBED_BATCH_SIZE]
+        )
+        embeddings.extend(e.values[:target_dim] for e in result.embeddings)
+    
+    return embeddings
+
+
+@lru_cache(maxsize=10000)
+def embed_query(text, target_dim=1024):
+    """Embed a single query string, memoized so repeated searches skip the API call.
+    
+    Returns a tuple (immutable, safe to share between callers); convert with
+    list() before handing it to Pinecone.
+    """
+    return tuple(embed_texts([text], target_dim)[0])
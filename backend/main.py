@@ -1,12 +1,14 @@
 """Main FastAPI application with MongoDB and GitHub OAuth."""
 import os
+import asyncio
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 # Import the existing API app
-from logic.api import app as existing_app
+from logic.api import app as existing_app, ORJSONResponse, refresh_stats_periodically
 
 # Import OAuth router
 from auth_oauth import router as oauth_router
@@ -20,11 +22,28 @@ async def lifespan(app: FastAPI):
     """Application lifespan handler."""
     # Startup
     print("🚀 Starting up...")
+    from db import ensure_indexes
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        print(f"⚠️  Warning: Could not create MongoDB indexes: {e}")
+    try:
+        from logic.kg_neo4j_images import ensure_schema
+        await asyncio.to_thread(ensure_schema)
+    except Exception as e:
+        print(f"⚠️  Warning: Could not create Neo4j constraints: {e}")
+    stats_task = asyncio.create_task(refresh_stats_periodically())
     yield
     # Shutdown
     print("🛑 Shutting down...")
+    stats_task.cancel()
     from db import close_db_connection
     await close_db_connection()
+    try:
+        from logic.kg_neo4j_images import close_driver
+        close_driver()
+    except ImportError:
+        pass
 
 
 def create_app() -> FastAPI:
@@ -33,7 +52,8 @@ def create_app() -> FastAPI:
         title="Space Biology Knowledge Engine",
         description="AI-powered NASA space biology research platform with GitHub OAuth",
         version="2.0.0",
-        lifespan=lifespan
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse
     )
     
     # Add CORS middleware - configure for production
@@ -46,12 +66,14 @@ def create_app() -> FastAPI:
         allow_headers=["Authorization", "Content-Type"],
     )
     
+    # Compress larger /search, /qa and graph payloads
+    app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+    
     # Include OAuth routes
     app.include_router(oauth_router)
     
-    # Mount existing app routes
-    for route in existing_app.routes:
-        app.routes.append(route)
+    # Include existing app routes through its router (one route table)
+    app.include_router(existing_app.router)
     
     @app.get("/health")
     async def health_check():
@@ -73,7 +95,19 @@ def create_app() -> FastAPI:
 app = create_app()
 
 if __name__ == "__main__":
+    import importlib.util
     import uvicorn
     # reload=True is only for development
     reload_mode = os.getenv("DEBUG", "false").lower() == "true"
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=reload_mode)
+    # uvloop/httptools ship with uvicorn[standard] (not available on Windows)
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=reload_mode,
+        loop=loop,
+        http=http,
+        workers=None if reload_mode else int(os.getenv("WEB_CONCURRENCY", "1"))
+    )
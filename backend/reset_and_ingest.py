@@ -9,8 +9,15 @@ This script:
 """
 import os
 import sys
+import asyncio
+import pathlib
+import hashlib
+import numpy as np
 import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
 from dotenv import load_dotenv
 from pinecone import Pinecone
 import time
@@ -18,6 +25,13 @@ import time
 # Load environment variables
 load_dotenv()
 
+# Cache keys only need to be collision resistant, not cryptographic
+try:
+    import xxhash
+except ImportError:
+    print("⚠️  Warning: xxhash not installed. Falling back to BLAKE2b cache keys.")
+    xxhash = None
+
 # Check environment variables
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -43,7 +57,27 @@ except Exception as e:
     sys.exit(1)
 
 # Import embedding function
-from logic.utils import embed_texts
+from logic.utils import embed_texts, aembed_texts
+from logic.ingest_progress import record_progress, reset_progress
+from logic.ingest_common import log, configure_logging
+
+# Embeddings from earlier runs, one float16 .npy per title (keyed by content
+# hash), so re-runs only spend API quota on new or changed titles
+EMBED_CACHE = pathlib.Path(os.getenv("EMBED_CACHE", "./.embed_cache"))
+EMBED_MODEL = "gemini-embedding-001"
+
+# Titles sent per embedding request
+EMBED_CHUNK_SIZE = 100
+# Seconds of rate-limit budget per embedded title (~92/minute, leaving buffer)
+SECONDS_PER_TITLE = 0.65
+# Embedding requests in flight at once
+EMBED_CONCURRENCY = 10
+# Upsert batches sent from a small thread pool; at most UPSERT_MAX_PENDING
+# are left unconfirmed before waiting on the oldest
+UPSERT_WORKERS = 4
+UPSERT_MAX_PENDING = 8
+# Attempts per upsert batch before its rows are reported as not uploaded
+UPSERT_MAX_RETRIES = 5
 
 
 def get_index_stats():
@@ -70,6 +104,7 @@ def clear_all_entries():
     try:
         # Delete all vectors
         index.delete(delete_all=True)
+        reset_progress()
         print("✅ All entries deleted successfully!")
         
         # Verify deletion
@@ -89,22 +124,120 @@ def clear_all_entries():
         return False
 
 
-def embed_with_retry(text, max_retries=5):
-    """Embed text with rate limit handling and retry logic"""
+def _embed_cache_path(text):
+    data = f"{EMBED_MODEL}:{text}".encode()
+    if xxhash is not None:
+        key = xxhash.xxh128_hexdigest(data)
+    else:
+        key = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return EMBED_CACHE / key[:2] / f"{key}.npy"
+
+
+def load_cached_embedding(text):
+    """Embedding cached for text by an earlier run (as float32 list), or None"""
+    try:
+        return np.load(_embed_cache_path(text)).astype(np.float32).tolist()
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_embedding(text, embedding):
+    """Cache an embedding on disk as float16 (half the size, ample for cosine search)"""
+    path = _embed_cache_path(text)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(embedding, dtype=np.float16))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        log.warning(f"⚠️  Could not cache embedding: {e}")
+
+
+async def embed_with_retry(texts, max_retries=5):
+    """Embed a batch of texts with rate limit handling and retry logic
+    
+    Returns one embedding per text, or None for texts that could not be
+    embedded. A batch failing for a reason other than rate limiting is split
+    in half and retried, so one bad title doesn't sink the whole batch.
+    """
     for attempt in range(max_retries):
         try:
-            return embed_texts([text])[0]
+            return await aembed_texts(texts)
         except Exception as e:
             error_str = str(e)
             if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
                 # Rate limited - wait and retry with exponential backoff
                 wait_time = min(60 * (2 ** attempt), 300)  # Max 5 minutes
-                print(f"\n   ⏳ Rate limited. Waiting {wait_time}s before retry {attempt+1}/{max_retries}...")
-                time.sleep(wait_time)
+                log.warning(f"⏳ Rate limited. Waiting {wait_time}s before retry {attempt+1}/{max_retries}...")
+                await asyncio.sleep(wait_time)
+            elif len(texts) > 1:
+                mid = len(texts) // 2
+                return await embed_with_retry(texts[:mid], max_retries) + await embed_with_retry(texts[mid:], max_retries)
             else:
-                print(f"\n   ❌ Embedding error: {e}")
-                return None
-    return None
+                log.warning(f"❌ Embedding error: {e}")
+                return [None]
+    return [None] * len(texts)
+
+
+async def embed_missing(titles):
+    """Embed titles EMBED_CHUNK_SIZE per request, EMBED_CONCURRENCY requests at a time
+    
+    Request starts are paced at SECONDS_PER_TITLE per title, so throughput is
+    set by the quota rather than by each response's round-trip time. Returns
+    {title: embedding} for the titles embedded; each is also cached on disk.
+    """
+    semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+    pace_lock = asyncio.Lock()
+    next_start = time.monotonic()
+    embeddings = {}
+    
+    async def embed_chunk(chunk):
+        nonlocal next_start
+        async with semaphore:
+            async with pace_lock:
+                now = time.monotonic()
+                start = max(now, next_start)
+                next_start = start + SECONDS_PER_TITLE * len(chunk)
+            if start > now:
+                await asyncio.sleep(start - now)
+            return chunk, await embed_with_retry(chunk)
+    
+    chunks = [titles[start:start + EMBED_CHUNK_SIZE] for start in range(0, len(titles), EMBED_CHUNK_SIZE)]
+    with tqdm(total=len(chunks), desc="Embedding", unit="batch") as pbar:
+        for done in asyncio.as_completed([embed_chunk(chunk) for chunk in chunks]):
+            chunk, results = await done
+            for title, embedding in zip(chunk, results):
+                if embedding is not None:
+                    embeddings[title] = embedding
+                    save_cached_embedding(title, embedding)
+            pbar.update()
+    return embeddings
+
+
+def upsert_with_retry(vectors, max_retries=UPSERT_MAX_RETRIES):
+    """index.upsert with exponential backoff; raises once the last attempt fails"""
+    for attempt in range(max_retries):
+        try:
+            return index.upsert(vectors=vectors)
+        except Exception as e:
+            if attempt == max_retries - 1:
+                raise
+            wait_time = min(2 ** attempt, 30)
+            log.warning(f"⏳ Upload failed ({e}). Waiting {wait_time}s before retry {attempt+1}/{max_retries}...")
+            time.sleep(wait_time)
+
+
+def wait_for_upsert(future, batch, failed_rows):
+    """Block on a submitted upsert of batch; on failure its row ids go to failed_rows"""
+    try:
+        future.result()
+        record_progress(batch)
+        return True
+    except Exception as e:
+        log.warning(f"❌ Batch upload error: {e}")
+        failed_rows.extend(metadata["row_id"] for _, _, metadata in batch)
+        return False
 
 
 def ingest_all_publications(batch_size=100):
@@ -122,81 +255,86 @@ def ingest_all_publications(batch_size=100):
         return 0
     
     print("⚠️  This will generate REAL Gemini embeddings for all publications")
-    print("   Estimated time: ~8-12 minutes (rate limited to ~100 req/min)")
+    print(f"   Titles are embedded {EMBED_CHUNK_SIZE} per request, {EMBED_CONCURRENCY} requests at a time;")
+    print("   cached titles are skipped")
     print("-"*60)
     
     vectors = []
     processed = 0
     skipped = 0
     errors = 0
-    last_request_time = 0
+    failed_rows = []
     
-    # Progress bar
-    pbar = tqdm(df.iterrows(), total=len(df), desc="Processing", unit="pub")
+    # Clean the columns once as arrays instead of building a Series per row
+    titles = df["Title"].fillna("").astype(str).str.strip().to_numpy()
+    links = df["Link"].fillna("").astype(str).str.strip().to_numpy()
     
-    for i, row in pbar:
-        title = str(row.get("Title", "")).strip()
-        link = str(row.get("Link", "")).strip()
-        
-        # Skip empty titles
-        if not title or title == "nan":
-            skipped += 1
-            continue
-        
-        # Rate limiting - ensure we don't exceed quota
-        current_time = time.time()
-        time_since_last = current_time - last_request_time
-        if time_since_last < 0.65:  # ~92 requests per minute
-            time.sleep(0.65 - time_since_last)
-        
-        # Create unique ID
-        unique_id = f"publication-{i:04d}"
-        
-        # Generate embedding
-        embedding = embed_with_retry(title)
-        last_request_time = time.time()
-        
-        if embedding is None:
-            errors += 1
-            skipped += 1
-            continue
-        
-        # Prepare metadata
-        metadata = {
-            "title": title,
-            "link": link,
-            "source": "nasa_publications",
-            "row_id": i,
-            "embedding_type": "gemini",
-            "embedding_model": "gemini-embedding-001"
-        }
-        
-        vectors.append((unique_id, embedding, metadata))
-        processed += 1
-        
-        # Update progress bar description
-        pbar.set_postfix({"Processed": processed, "Skipped": skipped})
-        
-        # Upload in batches
-        if len(vectors) >= batch_size:
-            try:
-                index.upsert(vectors=vectors)
-                vectors = []
-            except Exception as e:
-                print(f"\n❌ Batch upload error: {e}")
+    # Skip empty titles
+    mask = (titles != "") & (titles != "nan")
+    skipped += int((~mask).sum())
+    rows = [(int(i), titles[i], links[i]) for i in np.flatnonzero(mask)]
     
-    pbar.close()
+    # Reuse embeddings from earlier runs; only the remaining titles hit the API
+    embeddings = {}
+    missing = []
+    for title in dict.fromkeys(title for _, title, _ in rows):
+        embedding = load_cached_embedding(title)
+        if embedding is not None:
+            embeddings[title] = embedding
+        else:
+            missing.append(title)
+    cache_hits = len(embeddings)
     
-    # Final upload for remaining vectors
-    if vectors:
-        try:
-            index.upsert(vectors=vectors)
-        except Exception as e:
-            print(f"\n❌ Final upload error: {e}")
+    embeddings.update(asyncio.run(embed_missing(missing)))
+    
+    with ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as uploader:
+        pending = deque()
+        for i, title, link in rows:
+            embedding = embeddings.get(title)
+            if embedding is None:
+                errors += 1
+                skipped += 1
+                continue
+            
+            # Create unique ID
+            unique_id = f"publication-{i:04d}"
+            
+            # Prepare metadata
+            metadata = {
+                "title": title,
+                "link": link,
+                "source": "nasa_publications",
+                "row_id": i,
+                "embedding_type": "gemini",
+                "embedding_model": EMBED_MODEL
+            }
+            
+            vectors.append((unique_id, embedding, metadata))
+            processed += 1
+            
+            # Upload in batches without waiting for each round-trip
+            if len(vectors) >= batch_size:
+                pending.append((uploader.submit(upsert_with_retry, vectors), vectors))
+                vectors = []
+                if len(pending) > UPSERT_MAX_PENDING:
+                    wait_for_upsert(*pending.popleft(), failed_rows)
+        
+        # Final upload for remaining vectors, then wait for everything in flight
+        if vectors:
+            pending.append((uploader.submit(upsert_with_retry, vectors), vectors))
+        while pending:
+            wait_for_upsert(*pending.popleft(), failed_rows)
+    
+    processed -= len(failed_rows)
     
     print(f"\n🎉 Ingestion Complete!")
     print(f"   ✅ Successfully processed: {processed}")
+    print(f"   💾 Reused cached embeddings: {cache_hits}")
     print(f"   ⚠️  Skipped/Errors: {skipped}")
+    if failed_rows:
+        print(f"   ❌ Not uploaded after {UPSERT_MAX_RETRIES} attempts: {len(failed_rows)} rows")
+        print(f"      Row ids: {', '.join(map(str, sorted(failed_rows)))}")
+        print("      Run logic/ingest_resume.py to upload them")
     
     return processed
 
@@ -294,8 +432,10 @@ def main():
 
 
 if __name__ == "__main__":
+    configure_logging()
     try:
-        main()
+        with logging_redirect_tqdm():
+            main()
     except KeyboardInterrupt:
         print("\n\n⚠️  Interrupted by user. Cleaning up...")
         sys.exit(1)